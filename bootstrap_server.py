@@ -3,23 +3,28 @@
 import socket
 import threading
 import time
+import bisect
 import hashlib
 import json
 import logging
 import os
 from datetime import datetime
 
+from chord_protocol import configure_socket, connect_to, send_message, recv_message
+
 class BootstrapServer:
     def __init__(self, host="localhost", port=5000):
         self.host = host
         self.port = port
         self.stop = False
+        self.stop_event = threading.Event()  # Wakes the heartbeat monitor on shutdown
         self.M = 16
         self.N = 2**self.M
         
         # Track all nodes in the network
         self.nodes = {}  # {(host, port): {"key": key, "successor": tuple, "predecessor": tuple, "last_heartbeat": timestamp}}
         self.nodes_lock = threading.Lock()
+        self.ring_cache = None  # (sorted keys, matching addrs), rebuilt after membership changes
         self.start_time = time.time()  # Track server start time
         
         # Setup logging
@@ -36,7 +41,7 @@ class BootstrapServer:
         
     def hasher(self, key):
         """Hash function consistent with Node class"""
-        return int(hashlib.md5(key.encode()).hexdigest(), 16) % self.N
+        return int.from_bytes(hashlib.md5(key.encode()).digest(), 'big') % self.N
     
     def setup_logging(self):
         """Setup logging for bootstrap server"""
@@ -100,8 +105,9 @@ class BootstrapServer:
     
     def handle_connection(self, client_socket, addr):
         """Handle incoming connections from nodes"""
+        configure_socket(client_socket)
         try:
-            message = client_socket.recv(1024).decode('utf-8')
+            message = recv_message(client_socket)
             message_parts = message.split()
             
             if not message_parts:
@@ -135,7 +141,7 @@ class BootstrapServer:
         try:
             # Format: register <host> <port>
             if len(message_parts) < 3:
-                client_socket.send("error invalid_format".encode('utf-8'))
+                send_message(client_socket, "error invalid_format")
                 client_socket.close()
                 return
                 
@@ -153,7 +159,7 @@ class BootstrapServer:
                         "predecessor": node_addr,
                         "last_heartbeat": time.time()
                     }
-                    client_socket.send(f"first_node {node_host} {node_port}".encode('utf-8'))
+                    response = f"first_node {node_host} {node_port}"
                     self.logger.info(f"Registered first node: {node_addr} with key {node_key}")
                 else:
                     # Find appropriate position in the ring
@@ -174,15 +180,20 @@ class BootstrapServer:
                     # Update predecessor's successor  
                     self.nodes[predecessor_addr]["successor"] = node_addr
                     
-                    client_socket.send(f"join_position {successor_addr[0]} {successor_addr[1]} {predecessor_addr[0]} {predecessor_addr[1]}".encode('utf-8'))
+                    response = f"join_position {successor_addr[0]} {successor_addr[1]} {predecessor_addr[0]} {predecessor_addr[1]}"
                     self.logger.info(f"Registered node: {node_addr} with key {node_key}, successor: {successor_addr}, predecessor: {predecessor_addr}")
-                    
+                
+                # Membership changed, rebuild the sorted ring on the next lookup
+                self.ring_cache = None
+            
+            # Reply after releasing the lock so a slow client cannot stall other nodes
+            send_message(client_socket, response)
             print(f"Node {node_addr} registered with key {node_key}")
             
         except Exception as e:
             self.logger.error(f"Error in handle_register: {e}")
             print(f"Error in handle_register: {e}")
-            client_socket.send("error registration_failed".encode('utf-8'))
+            send_message(client_socket, "error registration_failed")
         finally:
             client_socket.close()
     
@@ -191,7 +202,7 @@ class BootstrapServer:
         try:
             # Format: lookup <key>
             if len(message_parts) < 2:
-                client_socket.send("error invalid_format".encode('utf-8'))
+                send_message(client_socket, "error invalid_format")
                 client_socket.close()
                 return
                 
@@ -199,14 +210,16 @@ class BootstrapServer:
             
             with self.nodes_lock:
                 if len(self.nodes) == 0:
-                    client_socket.send("error no_nodes".encode('utf-8'))
+                    response = "error no_nodes"
                 else:
                     successor_addr = self.find_successor(target_key)
-                    client_socket.send(f"found {successor_addr[0]} {successor_addr[1]}".encode('utf-8'))
+                    response = f"found {successor_addr[0]} {successor_addr[1]}"
+            
+            send_message(client_socket, response)
                     
         except Exception as e:
             print(f"Error in handle_lookup: {e}")
-            client_socket.send("error lookup_failed".encode('utf-8'))
+            send_message(client_socket, "error lookup_failed")
         finally:
             client_socket.close()
     
@@ -215,7 +228,7 @@ class BootstrapServer:
         try:
             # Format: heartbeat <host> <port>
             if len(message_parts) < 3:
-                client_socket.send("error invalid_format".encode('utf-8'))
+                send_message(client_socket, "error invalid_format")
                 client_socket.close()
                 return
                 
@@ -226,13 +239,15 @@ class BootstrapServer:
             with self.nodes_lock:
                 if node_addr in self.nodes:
                     self.nodes[node_addr]["last_heartbeat"] = time.time()
-                    client_socket.send("ack".encode('utf-8'))
+                    response = "ack"
                 else:
-                    client_socket.send("error not_registered".encode('utf-8'))
+                    response = "error not_registered"
+            
+            send_message(client_socket, response)
                     
         except Exception as e:
             print(f"Error in handle_heartbeat: {e}")
-            client_socket.send("error heartbeat_failed".encode('utf-8'))
+            send_message(client_socket, "error heartbeat_failed")
         finally:
             client_socket.close()
     
@@ -241,7 +256,7 @@ class BootstrapServer:
         try:
             # Format: leave <host> <port>
             if len(message_parts) < 3:
-                client_socket.send("error invalid_format".encode('utf-8'))
+                send_message(client_socket, "error invalid_format")
                 client_socket.close()
                 return
                 
@@ -252,15 +267,17 @@ class BootstrapServer:
             with self.nodes_lock:
                 if node_addr in self.nodes:
                     self.remove_node(node_addr)
-                    client_socket.send("ack".encode('utf-8'))
+                    response = "ack"
                     self.logger.info(f"Node {node_addr} left the network")
                     print(f"Node {node_addr} left the network")
                 else:
-                    client_socket.send("error not_registered".encode('utf-8'))
+                    response = "error not_registered"
+            
+            send_message(client_socket, response)
                     
         except Exception as e:
             print(f"Error in handle_leave: {e}")
-            client_socket.send("error leave_failed".encode('utf-8'))
+            send_message(client_socket, "error leave_failed")
         finally:
             client_socket.close()
     
@@ -273,11 +290,12 @@ class BootstrapServer:
                     nodes_info.append(f"{addr[0]}:{addr[1]}:{info['key']}")
                 
                 response = "nodes " + ",".join(nodes_info)
-                client_socket.send(response.encode('utf-8'))
+            
+            send_message(client_socket, response)
                 
         except Exception as e:
             print(f"Error in handle_get_nodes: {e}")
-            client_socket.send("error get_nodes_failed".encode('utf-8'))
+            send_message(client_socket, "error get_nodes_failed")
         finally:
             client_socket.close()
     
@@ -286,22 +304,22 @@ class BootstrapServer:
         if not self.nodes:
             return None
             
-        # Sort nodes by key
-        sorted_nodes = sorted(self.nodes.items(), key=lambda x: x[1]["key"])
+        # Sort nodes by key once per membership change instead of per lookup
+        if self.ring_cache is None:
+            sorted_nodes = sorted(self.nodes.items(), key=lambda x: x[1]["key"])
+            self.ring_cache = ([info["key"] for _, info in sorted_nodes],
+                               [addr for addr, _ in sorted_nodes])
+        keys, addrs = self.ring_cache
         
-        # Find the first node with key >= target key
-        for addr, info in sorted_nodes:
-            if info["key"] >= key:
-                return addr
-                
-        # If no node found, return the first node (wrap around)
-        return sorted_nodes[0][0]
+        # Find the first node with key >= target key, wrapping around to the first node
+        return addrs[bisect.bisect_left(keys, key) % len(addrs)]
     
     def remove_node(self, node_addr):
         """Remove a node from the ring and update connections"""
         if node_addr not in self.nodes:
             return
             
+        self.ring_cache = None
         node_info = self.nodes[node_addr]
         successor_addr = node_info["successor"]
         predecessor_addr = node_info["predecessor"]
@@ -345,9 +363,7 @@ class BootstrapServer:
     def send_topology_update(self, target_addr, update_type, new_addr):
         """Send topology update to a specific node"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5.0)
-            sock.connect(target_addr)
+            sock = connect_to(target_addr, timeout=5.0)
             
             if update_type == "update_predecessor":
                 message = f"topology_update_pred {new_addr[0]} {new_addr[1]}"
@@ -356,7 +372,7 @@ class BootstrapServer:
             else:
                 return
                 
-            sock.send(message.encode('utf-8'))
+            send_message(sock, message)
             sock.close()
             print(f"Sent topology update to {target_addr}: {update_type} -> {new_addr}")
             
@@ -368,7 +384,8 @@ class BootstrapServer:
         HEARTBEAT_TIMEOUT = 10  # seconds
         
         while not self.stop:
-            time.sleep(5)  # Check every 5 seconds
+            if self.stop_event.wait(5):  # Check every 5 seconds
+                break
             
             current_time = time.time()
             failed_nodes = []
@@ -406,23 +423,24 @@ class BootstrapServer:
                     "total_nodes": len(self.nodes),
                     "active_nodes": [f"{addr[0]}:{addr[1]}" for addr in self.nodes.keys()],
                     "timestamp": datetime.now().isoformat(),
-                    "uptime_seconds": int(time.time() - self.start_time) if hasattr(self, 'start_time') else 0
+                    "uptime_seconds": int(time.time() - self.start_time)
                 }
             
             response = json.dumps(status)
-            client_socket.send(response.encode('utf-8'))
+            send_message(client_socket, response)
             client_socket.close()
             
             self.logger.info("Provided status information to REST API")
             
         except Exception as e:
             self.logger.error(f"Error handling status request: {e}")
-            client_socket.send(json.dumps({"error": str(e)}).encode('utf-8'))
+            send_message(client_socket, json.dumps({"error": str(e)}))
             client_socket.close()
     
     def stop_server(self):
         """Stop the bootstrap server"""
         self.stop = True
+        self.stop_event.set()
         if self.server_socket:
             self.server_socket.close()
         print("Bootstrap server stopped")
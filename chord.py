@@ -1,4 +1,5 @@
 import socket
+import sys
 import threading
 import os
 import time
@@ -6,6 +7,11 @@ import hashlib
 import re
 import logging
 import random
+import functools
+import heapq
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Import metrics module
@@ -16,9 +22,82 @@ except ImportError:
     METRICS_AVAILABLE = False
     print("Warning: chord_metrics module not available. Metrics will be disabled.")
 
+from chord_protocol import configure_socket, connect_to, send_message, recv_message
+
+
+@functools.lru_cache(maxsize=8192)
+def _hash_key(key, ring_size):
+    """Map a key onto the identifier ring (memoized, keys are deterministic strings)"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest(), 'big') % ring_size
+
+
+# Word pattern for filename indexing, compiled once for the hot indexing/search path
+_WORD_RE = re.compile(r'[a-zA-Z0-9]+')
+
+
+@functools.lru_cache(maxsize=1024)
+def _node_key(addr, ring_size):
+    """Ring key of a (host, port) node address (memoized per address)"""
+    return _hash_key(addr[0] + str(addr[1]), ring_size)
+
+
+@functools.lru_cache(maxsize=4096)
+def _filename_words(filename):
+    """Extract index words from a filename (memoized, the result only depends on the name)"""
+    # Remove file extension
+    name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    # Split by common separators and extract words
+    words = _WORD_RE.findall(name_without_ext.lower())
+    # Filter out single characters and drop repeats (keeping first-seen order),
+    # so a word occurring twice in a name is not indexed twice
+    return tuple(dict.fromkeys(sys.intern(word) for word in words if len(word) > 1))
+
+
+# Reusable chunk buffers for receiving files, so streaming a file in does not
+# allocate a fresh bytes object for every chunk (sending uses socket.sendfile)
+FILE_CHUNK_SIZE = 64 * 1024
+MAX_POOLED_BUFFERS = 16
+_buffer_pool = queue.LifoQueue()
+
+# Successor ping interval backs off from 0.5s to 0.5s * 2**MAX_PING_BACKOFF (4s)
+# while neighbours stay unchanged
+MAX_PING_BACKOFF = 3
+
+# Recent search results are reused for a short time; index changes on this
+# node drop the affected queries, remote changes age out with the TTL
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 2.0
+
+
+def _acquire_buffer():
+    """Take a transfer buffer from the pool, allocating one if it is empty"""
+    try:
+        return _buffer_pool.get_nowait()
+    except queue.Empty:
+        return bytearray(FILE_CHUNK_SIZE)
+
+
+def _release_buffer(buf):
+    """Return a transfer buffer to the pool"""
+    if _buffer_pool.qsize() < MAX_POOLED_BUFFERS:
+        _buffer_pool.put_nowait(buf)
 
 class Node:
-    def __init__(self, host, port, bootstrap_host="localhost", bootstrap_port=9000):
+    @property
+    def stop(self):
+        return self.stop_event.is_set()
+    
+    @stop.setter
+    def stop(self, value):
+        # Backed by an Event so background loops can wait on it and wake up
+        # as soon as the node stops instead of polling the flag
+        if value:
+            self.stop_event.set()
+        else:
+            self.stop_event.clear()
+    
+    def __init__(self, host, port, bootstrap_host="localhost", bootstrap_port=9000, rpc_workers=None):
+        self.stop_event = threading.Event()
         self.stop = False
         self.host = host
         self.port = port
@@ -30,6 +109,43 @@ class Node:
         self.bootstrap_host = bootstrap_host
         self.bootstrap_port = bootstrap_port
         
+        # Incoming messages are dispatched on their first word
+        self.message_handlers = {
+            "lookup": self._on_lookup,
+            "store_index_entry": self._on_store_index_entry,
+            "store_index_entries": self._on_store_index_entries,
+            "query_index": self._on_query_index,
+            "dead_ping": self._on_dead_ping,
+            "ans_found": self._on_ans_found,
+            "1_person": self._on_1_person,
+            "sec_node_pred": self._on_sec_node_pred,
+            "join_change_succ1": self._on_join_change_succ1,
+            "join_change_pred": self._on_join_change_pred,
+            "change_pred_1": self._on_change_pred_1,
+            "change_succ_1": self._on_change_succ_1,
+            "alive_ping": self._on_alive_ping,
+            "suc_suc_change_ping": self._on_suc_suc_change_ping,
+            "put_backup": self._on_put_backup,
+            "lookup_file": self._on_lookup_file,
+            "target_file_spot": self._on_target_file_spot,
+            "put_file": self._on_put_file,
+            "get_lookup_file": self._on_get_lookup_file,
+            "getfunc_file_spot": self._on_getfunc_file_spot,
+            "send_file": self._on_send_file,
+            "succ_send_files_in_range": self._on_succ_send_files_in_range,
+            "files_to_del": self._on_files_to_del,
+            "succ_send_files": self._on_succ_send_files,
+            "file_key_is_xx": self._on_file_key_is_xx,
+            "store_backup_files": self._on_store_backup_files,
+            "restore_backup_file": self._on_restore_backup_file,
+            "leaving": self._on_leaving,
+            "going_change_succ_succ": self._on_going_change_succ_succ,
+            "going_change_successor": self._on_going_change_successor,
+            "topology_update_pred": self._on_topology_update_pred,
+            "topology_update_succ": self._on_topology_update_succ,
+            "leaving_succ_take_files": self._on_leaving_succ_take_files,
+        }
+        
         # You will need to kill this thread when leaving, to do so just set self.stop = True
         threading.Thread(target = self.listener).start()
         self.files = []
@@ -37,8 +153,27 @@ class Node:
         self.backUpFiles = []
         
         # File indexing system - Phase 2
-        self.file_index = {}  # {word: [(filename, [other_words])]}
+        self.file_index = {}  # {word: {filename: None}}, a dict so postings keep insertion order
+        self.index_words = {}  # {filename: [words]}, shared by every word of the file
+        self.index_entry_count = 0  # Total (word, filename) postings, kept in step with file_index
+        self.index_lock = threading.Lock()  # Guards file_index, index_words and index_entry_count
         self.backup_index = {}  # Backup of index entries
+        self.search_cache = OrderedDict()  # {search words tuple: (timestamp, results)}, LRU order
+        self.search_cache_keys = {}  # {word: {search words tuple}}, the cached queries using each word
+        self.search_cache_lock = threading.Lock()
+        
+        # Shared pool for fanning out RPCs (per-word search lookups, index
+        # hand-off on leave), so each operation does not spawn its own threads.
+        # Sized by the rpc_workers argument, else CHORD_RPC_WORKERS, else the CPU count
+        if not rpc_workers:
+            env_workers = os.environ.get("CHORD_RPC_WORKERS", "")
+            try:
+                rpc_workers = max(int(env_workers), 0) if env_workers else 0
+            except ValueError:
+                print(f"Ignoring invalid CHORD_RPC_WORKERS value: {env_workers!r}")
+                rpc_workers = 0
+        self.rpc_workers = rpc_workers or os.cpu_count() or 4
+        self.rpc_pool = ThreadPoolExecutor(max_workers=self.rpc_workers, thread_name_prefix=f"chord-rpc-{port}")
         
         # Initialize metrics (default metrics port is node_port + 1000)
         metrics_port = port + 1000 if METRICS_AVAILABLE else None
@@ -65,8 +200,10 @@ class Node:
         self.joinedx = False
         self.join_one_node = False
 
-        if not os.path.exists(host+"_"+str(port)):
-            os.mkdir(host+"_"+str(port))
+        # Directory holding this node's files, built once instead of per operation
+        self.node_dir = f"{host}_{port}"
+        if not os.path.exists(self.node_dir):
+            os.mkdir(self.node_dir)
         
         # Setup logging for this node
         self.setup_logging()
@@ -93,7 +230,11 @@ class Node:
 
     def hasher(self, key):
         '''nn'''
-        return int(hashlib.md5(key.encode()).hexdigest(), 16) % self.N
+        return _hash_key(key, self.N)
+    
+    def node_key(self, addr):
+        """Ring key of a node address, without rebuilding the host+port key string each call"""
+        return _node_key(tuple(addr), self.N)
     
     def setup_logging(self):
         """Setup logging for this node"""
@@ -136,67 +277,108 @@ class Node:
     
     def extract_words_from_filename(self, filename):
         """Extract words from filename for indexing"""
-        import re
-        # Remove file extension
-        name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
-        # Split by common separators and extract words
-        words = re.findall(r'[a-zA-Z0-9]+', name_without_ext.lower())
-        return [word for word in words if len(word) > 1]  # Filter out single characters
+        return list(_filename_words(filename))
     
     def create_file_index_entry(self, filename):
         """Create index entries for a file"""
         words = self.extract_words_from_filename(filename)
         return words
     
-    def store_index_entry(self, word, filename, all_words):
-        """Store an index entry for a word"""
-        word_key = self.hasher(word)
-        
-        # Use the same lookup mechanism as files
-        # First check if this node is responsible
-        if self.is_responsible_for_key(word_key):
-            # This node is responsible for the index entry
-            if word not in self.file_index:
-                self.file_index[word] = []
-            
-            # Check if this filename is already indexed for this word
-            existing_entry_index = None
-            for i, entry in enumerate(self.file_index[word]):
-                if entry[0] == filename:
-                    existing_entry_index = i
-                    break
-            
-            if existing_entry_index is not None:
-                # Update existing entry by replacing the tuple
-                self.file_index[word][existing_entry_index] = (filename, all_words)
+    def store_index_entries(self, filename, all_words):
+        """Store the index entries for every word of a file, one message per responsible node"""
+        # Words held by the same node (every non-local word goes to the
+        # successor first) are sent together instead of one connection each
+        grouped = {}
+        for word in all_words:
+            word_key = self.hasher(word)
+            if self.is_responsible_for_key(word_key):
+                self.add_index_entry(word, filename, all_words)
+                self.logger.debug(f"Indexed word '{word}' for file '{filename}' on this node")
+                continue
+            responsible_node = self.find_responsible_node_for_key(word_key)
+            if responsible_node and responsible_node != (self.host, self.port):
+                grouped.setdefault(responsible_node, []).append(word)
             else:
-                # Add new entry
-                self.file_index[word].append((filename, all_words))
-            
-            print(f"Indexed word '{word}' for file '{filename}' on this node")
-            self.logger.debug(f"Indexed word '{word}' for file '{filename}' on this node")
-        else:
-            # Send index entry to responsible node using distributed lookup
+                # Fallback: store locally if can't find responsible node
+                self.add_index_entry(word, filename, all_words)
+                self.logger.warning(f"Stored index entry for word '{word}' locally (fallback)")
+        
+        for responsible_node, words in grouped.items():
             try:
-                responsible_node = self.find_responsible_node_for_key(word_key)
-                if responsible_node and responsible_node != (self.host, self.port):
-                    self.send_index_entry_to_node(word, filename, all_words, responsible_node)
-                    self.logger.debug(f"Sent index entry for word '{word}' to node {responsible_node}")
-                    print(f"Sent index entry for word '{word}' to node {responsible_node}")
-                else:
-                    # Fallback: store locally if can't find responsible node
-                    if word not in self.file_index:
-                        self.file_index[word] = []
-                    self.file_index[word].append((filename, all_words))
-                    self.logger.warning(f"Stored index entry for word '{word}' locally (fallback)")
-                    print(f"Stored index entry for word '{word}' locally (fallback)")
+                self.send_index_entries_to_node(words, filename, all_words, responsible_node)
+                self.logger.debug(f"Sent index entries for words {words} to node {responsible_node}")
+                print(f"Sent index entries for words {words} to node {responsible_node}")
             except Exception as e:
-                self.logger.error(f"Failed to send index entry for word '{word}': {e}")
-                print(f"Failed to send index entry for word '{word}': {e}")
+                self.logger.error(f"Failed to send index entries for words {words}: {e}")
+                print(f"Failed to send index entries for words {words}: {e}")
                 # Fallback: store locally
-                if word not in self.file_index:
-                    self.file_index[word] = []
-                self.file_index[word].append((filename, all_words))
+                for word in words:
+                    self.add_index_entry(word, filename, all_words)
+    
+    def add_index_entry(self, word, filename, all_words):
+        """Add or replace the local index entry for a word and filename"""
+        # Postings only hold filenames; the word list of a file is stored once
+        # in index_words instead of being repeated under each of its words.
+        # Names arriving over the network are interned so every posting and
+        # dict key for the same name shares one string object
+        word = sys.intern(word)
+        filename = sys.intern(filename)
+        with self.index_lock:
+            postings = self.file_index.setdefault(word, {})
+            if filename not in postings:
+                postings[filename] = None
+                self.index_entry_count += 1
+            self.index_words[filename] = all_words
+        self.invalidate_search_cache(word)
+    
+    def invalidate_search_cache(self, word):
+        """Drop cached search results for queries containing a word"""
+        if word not in self.search_cache_keys:
+            return
+        # The reverse map finds the affected queries without scanning the cache
+        with self.search_cache_lock:
+            for key in self.search_cache_keys.pop(word, ()):
+                self._drop_cached_search(key)
+    
+    def _drop_cached_search(self, key):
+        """Remove one cached query and its reverse map entries (caller holds search_cache_lock)"""
+        self.search_cache.pop(key, None)
+        for word in key:
+            keys = self.search_cache_keys.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.search_cache_keys[word]
+    
+    def get_cached_search(self, key):
+        """Return cached results for a query if they are still fresh, else None"""
+        with self.search_cache_lock:
+            entry = self.search_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= SEARCH_CACHE_TTL:
+                self._drop_cached_search(key)
+                return None
+            self.search_cache.move_to_end(key)
+            return entry[1]
+    
+    def cache_search(self, key, results):
+        """Store query results, evicting the least recently used query when full"""
+        with self.search_cache_lock:
+            self.search_cache[key] = (time.monotonic(), results)
+            self.search_cache.move_to_end(key)
+            for word in key:
+                self.search_cache_keys.setdefault(word, set()).add(key)
+            if len(self.search_cache) > SEARCH_CACHE_SIZE:
+                self._drop_cached_search(next(iter(self.search_cache)))
+    
+    def get_local_index_entries(self, word):
+        """Return the (filename, words) pairs indexed locally for a word"""
+        # Copy the postings under the lock; iterating them in Python while a
+        # handler thread adds to them raises RuntimeError
+        with self.index_lock:
+            filenames = tuple(self.file_index.get(word.lower(), ()))
+        return [(filename, self.index_words.get(filename, [])) for filename in filenames]
     
     def is_responsible_for_key(self, key):
         """Check if this node is responsible for a given key"""
@@ -207,7 +389,7 @@ class Node:
         if not self.successor or len(self.successor) != 2:
             return True  # Fallback to local storage
             
-        successor_key = self.hasher(self.successor[0] + str(self.successor[1]))
+        successor_key = self.node_key(self.successor)
         
         if successor_key > self.key:
             # Normal case: key should be > self.key and <= successor_key
@@ -229,14 +411,12 @@ class Node:
         """Send an index entry to the responsible node"""
         sock = None
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10.0)
-            sock.connect(target_node)
+            sock = connect_to(target_node, timeout=10.0)
             
             # Send index entry message
             other_words_str = ",".join(all_words)
             message = f"store_index_entry {word} {filename} {other_words_str}"
-            sock.send(message.encode('utf-8'))
+            send_message(sock, message)
             sock.close()
             
         except Exception as e:
@@ -247,8 +427,26 @@ class Node:
                     pass
             raise Exception(f"Index entry transfer failed: {e}")
     
-    def search_word_in_index(self, search_word):
-        """Search for files containing a specific word"""
+    def send_index_entries_to_node(self, words, filename, all_words, target_node):
+        """Send the index entries of several words of one file in a single message"""
+        sock = None
+        try:
+            sock = connect_to(target_node, timeout=10.0)
+            
+            message = f"store_index_entries {filename} {','.join(words)} {','.join(all_words)}"
+            send_message(sock, message)
+            sock.close()
+            
+        except Exception as e:
+            if sock:
+                try:
+                    sock.close()
+                except:
+                    pass
+            raise Exception(f"Index entry transfer failed: {e}")
+    
+    def search_word_in_index(self, search_word, fallbacks=None):
+        """Search for files containing a specific word, appending it to `fallbacks` if the responsible node could not be reached"""
         word_key = self.hasher(search_word.lower())
         
         # Track query metrics
@@ -257,7 +455,7 @@ class Node:
                 # Check if this node is responsible for this word
                 if self.is_responsible_for_key(word_key):
                     # This node has the index for this word
-                    return self.file_index.get(search_word.lower(), [])
+                    return self.get_local_index_entries(search_word)
                 else:
                     # Query the responsible node
                     try:
@@ -267,38 +465,41 @@ class Node:
                             return self.query_index_from_node(search_word, responsible_node)
                         else:
                             # Fallback: check local index
-                            return self.file_index.get(search_word.lower(), [])
+                            return self.get_local_index_entries(search_word)
                     except Exception as e:
                         print(f"Failed to query index from responsible node: {e}")
                         # Fallback: check local index
-                        return self.file_index.get(search_word.lower(), [])
+                        if fallbacks is not None:
+                            fallbacks.append(search_word)
+                        return self.get_local_index_entries(search_word)
         else:
             # Original code without metrics
             if self.is_responsible_for_key(word_key):
-                return self.file_index.get(search_word.lower(), [])
+                return self.get_local_index_entries(search_word)
             else:
                 try:
                     responsible_node = self.find_responsible_node_for_key(word_key)
                     if responsible_node and responsible_node != (self.host, self.port):
                         return self.query_index_from_node(search_word, responsible_node)
                     else:
-                        return self.file_index.get(search_word.lower(), [])
+                        return self.get_local_index_entries(search_word)
                 except Exception as e:
                     print(f"Failed to query index from responsible node: {e}")
-                    return self.file_index.get(search_word.lower(), [])
+                    if fallbacks is not None:
+                        fallbacks.append(search_word)
+                    return self.get_local_index_entries(search_word)
     
     def query_index_from_node(self, search_word, target_node):
         """Query index from a remote node"""
+        sock = None
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10.0)
-            sock.connect(target_node)
+            sock = connect_to(target_node, timeout=10.0)
             
             message = f"query_index {search_word} {self.host} {self.port}"
-            sock.send(message.encode('utf-8'))
+            send_message(sock, message)
             
             # Wait for response
-            response = sock.recv(4096).decode('utf-8')
+            response = recv_message(sock)
             sock.close()
             
             # Parse response
@@ -328,11 +529,9 @@ class Node:
     def send_to_bootstrap(self, message):
         """Send message to bootstrap server and get response"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5.0)  # 5 second timeout
-            sock.connect((self.bootstrap_host, self.bootstrap_port))
-            sock.send(message.encode('utf-8'))
-            response = sock.recv(1024).decode('utf-8')
+            sock = connect_to((self.bootstrap_host, self.bootstrap_port), timeout=5.0)
+            send_message(sock, message)
+            response = recv_message(sock)
             sock.close()
             return response
         except socket.timeout:
@@ -359,11 +558,8 @@ class Node:
             except Exception as e:
                 print(f"Heartbeat error: {e}")
             
-            # Sleep in smaller chunks to respond to stop signal faster
-            for _ in range(30):  # 3 seconds total, check stop every 0.1s
-                if self.stop:
-                    break
-                time.sleep(0.1)
+            # Wait 3 seconds, waking up immediately if the node stops
+            self.stop_event.wait(3)
     
     def update_metrics_periodically(self):
         """Update metrics periodically"""
@@ -372,7 +568,7 @@ class Node:
                 if self.metrics:
                     # Update file counts
                     files_count = len(self.files)
-                    index_count = sum(len(entries) for entries in self.file_index.values())
+                    index_count = self.index_entry_count
                     backup_count = len(self.backUpFiles)
                     self.metrics.update_file_counts(files_count, index_count, backup_count)
                     
@@ -387,11 +583,8 @@ class Node:
             except Exception as e:
                 print(f"Metrics update error: {e}")
             
-            # Update every 10 seconds
-            for _ in range(100):  # 10 seconds total, check stop every 0.1s
-                if self.stop:
-                    break
-                time.sleep(0.1)
+            # Update every 10 seconds, waking up immediately if the node stops
+            self.stop_event.wait(10)
     
     def send_message_with_metrics(self, target_node, message, message_type=None):
         """Send a message and track metrics"""
@@ -405,10 +598,9 @@ class Node:
             self.metrics.record_message_sent(message_type, target_str)
         
         # Send the message
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock = connect_to(target_node)
         try:
-            sock.connect(target_node)
-            sock.send(message.encode('utf-8'))
+            send_message(sock, message)
             return sock
         except Exception as e:
             sock.close()
@@ -430,17 +622,16 @@ class Node:
     
     def discover_files(self):
         """Automatically discover files in the node's directory"""
-        node_dir = f"{self.host}_{self.port}"
+        node_dir = self.node_dir
         
         while not self.stop:
             try:
                 if os.path.exists(node_dir):
-                    # Get current files in directory
-                    current_files = set()
-                    for file_name in os.listdir(node_dir):
-                        file_path = os.path.join(node_dir, file_name)
-                        if os.path.isfile(file_path) and not file_name.startswith('.'):
-                            current_files.add(file_name)
+                    # Get current files in directory (scandir reports the entry
+                    # type with the listing, so this needs no stat per file)
+                    with os.scandir(node_dir) as entries:
+                        current_files = {entry.name for entry in entries
+                                         if not entry.name.startswith('.') and entry.is_file()}
                     
                     # Get files currently tracked by this node
                     tracked_files = set(self.files)
@@ -470,8 +661,7 @@ class Node:
                             # Create index entries for this file
                             try:
                                 words = self.create_file_index_entry(file_name)
-                                for word in words:
-                                    self.store_index_entry(word, file_name, words)
+                                self.store_index_entries(file_name, words)
                                 self.logger.debug(f"Created index entries for file {file_name}: {words}")
                                 print(f"Created index entries for file {file_name}: {words}")
                             except Exception as e:
@@ -489,8 +679,7 @@ class Node:
                                     # Create index entries before transferring file
                                     try:
                                         words = self.create_file_index_entry(file_name)
-                                        for word in words:
-                                            self.store_index_entry(word, file_name, words)
+                                        self.store_index_entries(file_name, words)
                                         self.logger.debug(f"Created index entries for file {file_name}: {words}")
                                         print(f"Created index entries for file {file_name}: {words}")
                                     except Exception as e:
@@ -524,11 +713,8 @@ class Node:
                 self.logger.error(f"File discovery error: {e}")
                 print(f"File discovery error: {e}")
             
-            # Check every 5 seconds
-            for _ in range(50):  # 5 seconds total, check stop every 0.1s
-                if self.stop:
-                    break
-                time.sleep(0.1)
+            # Check every 5 seconds, waking up immediately if the node stops
+            self.stop_event.wait(5)
     
     def transfer_file_to_node(self, file_name, target_node):
         """Transfer a file to the responsible node"""
@@ -538,19 +724,16 @@ class Node:
                 raise Exception(f"Invalid target node: {target_node}")
             
             # Check if file exists
-            file_path = os.path.join(f"{self.host}_{self.port}", file_name)
+            file_path = os.path.join(self.node_dir, file_name)
             if not os.path.exists(file_path):
                 raise Exception(f"File {file_path} does not exist")
             
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10.0)  # 10 second timeout
-            sock.connect(target_node)
+            sock = connect_to(target_node, timeout=10.0)
             
             message = f"put_file {file_name}"
-            sock.send(message.encode('utf-8'))
+            send_message(sock, message)
             
             # Send the file
-            time.sleep(0.5)
             self.sendFile(sock, file_path)
             sock.close()
             
@@ -564,7 +747,13 @@ class Node:
     def handleConnection(self, client, addr):
         '''nn'''
         start_time = time.time()
-        incoming_message = client.recv(1024).decode('utf-8')
+        configure_socket(client)
+        try:
+            incoming_message = recv_message(client)
+        except (ConnectionError, ValueError, UnicodeDecodeError) as e:
+            print(f"Dropped malformed message from {addr}: {e}")
+            client.close()
+            return
         message_list = incoming_message.split()
         
         if not message_list:
@@ -587,540 +776,555 @@ class Node:
     
     def _handle_message_content(self, client, addr, message_list):
         """Handle the actual message content (separated for metrics)"""
-        message_type = message_list[0]
+        handler = self.message_handlers.get(message_list[0])
+        if handler:
+            handler(client, addr, message_list)
+    
+    def _on_lookup(self, client, addr, message_list):
+        """Resolve a join lookup and send the position back to the joining node"""
+        client.close()
+        tuple_ret = self.lookup(int(message_list[3]), (message_list[1], int(message_list[2])))
 
-        if message_list[0] =="lookup":
-            client.close()
-            tuple_ret = self.lookup(int(message_list[3]), (message_list[1], int(message_list[2])))
+        ans_check = False
 
+        if tuple_ret != (" ", 0):
+            ans_check = True
+        else:
             ans_check = False
 
-            if tuple_ret != (" ", 0):
-                ans_check = True
-            else:
-                ans_check = False
-
-            if ans_check:
-                msg_type = "ans_found" 
-                arg1 = str(tuple_ret[0])
-                arg2 = str(tuple_ret[1])
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                message = msg_type + " "+ arg1 + " "+ arg2
-                soc.connect((message_list[1], int(message_list[2])))
-                soc.send(message.encode('utf-8'))
-                soc.close()
-
-        # Handle file indexing messages
-        if message_list[0] == "store_index_entry":
-            word = message_list[1]
-            filename = message_list[2]
-            other_words_str = message_list[3] if len(message_list) > 3 else ""
-            other_words = other_words_str.split(",") if other_words_str else []
-            
-            word_key = self.hasher(word)
+        if ans_check:
+            msg_type = "ans_found" 
+            arg1 = str(tuple_ret[0])
+            arg2 = str(tuple_ret[1])
+            message = msg_type + " "+ arg1 + " "+ arg2
+            soc = connect_to((message_list[1], int(message_list[2])))
+            send_message(soc, message)
+            soc.close()
+    
+    # Handle file indexing messages
+    def _on_store_index_entry(self, client, addr, message_list):
+        """Store or forward a single index entry"""
+        word = message_list[1]
+        filename = message_list[2]
+        other_words_str = message_list[3] if len(message_list) > 3 else ""
+        other_words = other_words_str.split(",") if other_words_str else []
+        
+        word_key = self.hasher(word)
+        
+        # Check if this node is responsible for this word
+        if self.is_responsible_for_key(word_key):
+            # Store the index entry on this node
+            self.add_index_entry(word, filename, other_words)
             
-            # Check if this node is responsible for this word
-            if self.is_responsible_for_key(word_key):
-                # Store the index entry on this node
-                if word not in self.file_index:
-                    self.file_index[word] = []
-                
-                # Check if this filename is already indexed for this word
-                existing_entry_index = None
-                for i, entry in enumerate(self.file_index[word]):
-                    if entry[0] == filename:
-                        existing_entry_index = i
-                        break
-                
-                if existing_entry_index is not None:
-                    # Update existing entry by replacing the tuple
-                    self.file_index[word][existing_entry_index] = (filename, other_words)
-                else:
-                    # Add new entry
-                    self.file_index[word].append((filename, other_words))
-                
-                print(f"Stored index entry: '{word}' -> '{filename}' with words {other_words}")
+            print(f"Stored index entry: '{word}' -> '{filename}' with words {other_words}")
+        else:
+            # Forward to the next node
+            try:
+                next_node = self.successor
+                if next_node and next_node != (self.host, self.port):
+                    forward_sock = connect_to(next_node)
+                    forward_message = f"store_index_entry {word} {filename} {other_words_str}"
+                    send_message(forward_sock, forward_message)
+                    forward_sock.close()
+                    print(f"Forwarded index entry for '{word}' to {next_node}")
+            except Exception as e:
+                print(f"Failed to forward index entry: {e}")
+        
+        client.close()
+    
+    def _on_store_index_entries(self, client, addr, message_list):
+        """Store or forward several index entries of one file"""
+        filename = message_list[1]
+        words = message_list[2].split(",")
+        other_words_str = message_list[3] if len(message_list) > 3 else ""
+        other_words = other_words_str.split(",") if other_words_str else []
+        
+        # Keep the words this node is responsible for and forward the rest
+        # to the successor together
+        forward_words = []
+        for word in words:
+            if self.is_responsible_for_key(self.hasher(word)):
+                self.add_index_entry(word, filename, other_words)
             else:
-                # Forward to the next node
-                try:
-                    next_node = self.successor
-                    if next_node and next_node != (self.host, self.port):
-                        forward_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        forward_sock.connect(next_node)
-                        forward_message = f"store_index_entry {word} {filename} {other_words_str}"
-                        forward_sock.send(forward_message.encode('utf-8'))
-                        forward_sock.close()
-                        print(f"Forwarded index entry for '{word}' to {next_node}")
-                except Exception as e:
-                    print(f"Failed to forward index entry: {e}")
-            
-            client.close()
-
-        if message_list[0] == "query_index":
-            search_word = message_list[1].lower()
-            requester_host = message_list[2]
-            requester_port = int(message_list[3])
-            
-            word_key = self.hasher(search_word)
+                forward_words.append(word)
+        print(f"Stored {len(words) - len(forward_words)} index entries for '{filename}'")
+        
+        if forward_words:
+            try:
+                next_node = self.successor
+                if next_node and next_node != (self.host, self.port):
+                    self.send_index_entries_to_node(forward_words, filename, other_words, next_node)
+                    print(f"Forwarded index entries for {forward_words} to {next_node}")
+            except Exception as e:
+                print(f"Failed to forward index entries: {e}")
+        
+        client.close()
+    
+    def _on_query_index(self, client, addr, message_list):
+        """Answer or forward an index query for a word"""
+        search_word = message_list[1].lower()
+        requester_host = message_list[2]
+        requester_port = int(message_list[3])
+        
+        word_key = self.hasher(search_word)
+        
+        # Check if this node is responsible for this word
+        if self.is_responsible_for_key(word_key):
+            # Get index results for this word
+            results = self.get_local_index_entries(search_word)
             
-            # Check if this node is responsible for this word
-            if self.is_responsible_for_key(word_key):
-                # Get index results for this word
-                results = self.file_index.get(search_word, [])
-                
-                # Format response
-                if not results:
-                    response = "index_results EMPTY"
-                else:
-                    results_parts = []
-                    for filename, words in results:
-                        words_str = ",".join(words) if words else ""
-                        results_parts.append(f"{filename}:{words_str}")
-                    results_str = "|".join(results_parts)
-                    response = f"index_results {search_word} {results_str}"
-                
-                client.send(response.encode('utf-8'))
+            # Format response
+            if not results:
+                response = "index_results EMPTY"
             else:
-                # Forward to the next node
-                try:
-                    next_node = self.successor
-                    if next_node and next_node != (self.host, self.port):
-                        forward_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        forward_sock.settimeout(10.0)
-                        forward_sock.connect(next_node)
-                        forward_message = f"query_index {search_word} {requester_host} {requester_port}"
-                        forward_sock.send(forward_message.encode('utf-8'))
-                        
-                        # Get response and forward it back
-                        response = forward_sock.recv(4096).decode('utf-8')
-                        forward_sock.close()
-                        client.send(response.encode('utf-8'))
-                        print(f"Forwarded index query for '{search_word}' to {next_node}")
-                    else:
-                        # No successor, return empty
-                        client.send("index_results EMPTY".encode('utf-8'))
-                except Exception as e:
-                    print(f"Failed to forward index query: {e}")
-                    client.send("index_results EMPTY".encode('utf-8'))
+                results_parts = []
+                for filename, words in results:
+                    words_str = ",".join(words) if words else ""
+                    results_parts.append(f"{filename}:{words_str}")
+                results_str = "|".join(results_parts)
+                response = f"index_results {search_word} {results_str}"
             
-            client.close()
-
-        ####################################### End of indexing messages
-
-        ############################################# ping statements part 1
-        # new node will recv this from old node
-
-        ###### ping new attempt
-
-        if message_list[0] == "dead_ping":
-            pred1 = message_list[1]
-            pred2 = int(message_list[2])
-            self.predecessor = (pred1 , pred2)
-            msg = ""
-            if message_list[3] == "no":
-                msg = "alive"
-            else:
-                msg = "not_alive"
-
-           
-            conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            conn.connect(self.predecessor)
-            suc0 = str(self.successor[0])
-            suc1 = str(self.successor[1]) 
-            message = "suc_suc_change_ping" +" "+ suc0 + " "+ suc1 + " "+ msg
-            conn.send(message.encode('utf-8'))
-            conn.close()
-            client.close()
-
-        ################################################################ Join statements
-
-        if message_list[0] == "ans_found":
-            client.close()
-            ans1 = message_list[1]
-            ans2 = int(message_list[2])
-            self.position = (ans1, ans2)
-
-
-        if message_list[0] == "1_person" :
-            ans1 = message_list[1]
-            ans2 = int(message_list[2])
-            client.close()
+            send_message(client, response)
+        else:
+            # Forward to the next node
+            try:
+                next_node = self.successor
+                if next_node and next_node != (self.host, self.port):
+                    forward_sock = connect_to(next_node, timeout=10.0)
+                    forward_message = f"query_index {search_word} {requester_host} {requester_port}"
+                    send_message(forward_sock, forward_message)
+                    
+                    # Get response and forward it back
+                    response = recv_message(forward_sock)
+                    forward_sock.close()
+                    send_message(client, response)
+                    print(f"Forwarded index query for '{search_word}' to {next_node}")
+                else:
+                    # No successor, return empty
+                    send_message(client, "index_results EMPTY")
+            except Exception as e:
+                print(f"Failed to forward index query: {e}")
+                send_message(client, "index_results EMPTY")
+        
+        client.close()
+    
+    ####################################### End of indexing messages
+    ############################################# ping statements part 1
+    # new node will recv this from old node
+    ###### ping new attempt
+    def _on_dead_ping(self, client, addr, message_list):
+        """Take over from a failed predecessor and tell it our successor"""
+        pred1 = message_list[1]
+        pred2 = int(message_list[2])
+        self.predecessor = (pred1 , pred2)
+        msg = ""
+        if message_list[3] == "no":
+            msg = "alive"
+        else:
+            msg = "not_alive"
 
-            self.position = (ans1, ans2)
-            self.join_bool = True
            
+        conn = connect_to(self.predecessor)
+        suc0 = str(self.successor[0])
+        suc1 = str(self.successor[1]) 
+        message = "suc_suc_change_ping" +" "+ suc0 + " "+ suc1 + " "+ msg
+        send_message(conn, message)
+        conn.close()
+        client.close()
+    
+    ################################################################ Join statements
+    def _on_ans_found(self, client, addr, message_list):
+        """Record the position found for this node's join"""
+        client.close()
+        ans1 = message_list[1]
+        ans2 = int(message_list[2])
+        self.position = (ans1, ans2)
+    
+    def _on_1_person(self, client, addr, message_list):
+        """Record the position when joining a single node ring"""
+        ans1 = message_list[1]
+        ans2 = int(message_list[2])
+        client.close()
+
+        self.position = (ans1, ans2)
+        self.join_bool = True
+    
+    def _on_sec_node_pred(self, client, addr, message_list):
+        """Link up with the only other node in the ring"""
+        
+        self.predecessor = (str(message_list[1]), int(message_list[2]))
 
+        s_1 = str(message_list[1])
+        s_2 = int(message_list[2])
 
-        if message_list[0] == "sec_node_pred":
-            
-            self.predecessor = (str(message_list[1]), int(message_list[2]))
-
-            s_1 = str(message_list[1])
-            s_2 = int(message_list[2])
-
-            self.successor = (s_1, s_2)
-            client.close()
-
-        if message_list[0] == "join_change_succ1":
-            s_1 = str(message_list[1])
-            s_2 = int(message_list[2])
-
-            self.successor = (s_1, s_2)
-
-            #self.successor = (message_list[1], int(message_list[2]))
-            _curr_node = False
-            send_msg = False
-            message = "change_pred_1" + " " + str(self.host) + " " + str(self.port)
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-            if send_msg:
-                _curr_node = True
-
-            soc.connect(self.successor)
-            soc.send(message.encode('utf-8'))
-            soc.close()
-            client.close()
-
-        if message_list[0] == "join_change_pred":
-            ex_pred = self.predecessor
-            p_1 = message_list[1]
-            p_2 = int(message_list[2])
-
-            self.predecessor = (p_1, p_2)
-
-            succ1 = str(self.successor[0])
-            succ2 = str(self.successor[1])
+        self.successor = (s_1, s_2)
+        client.close()
+    
+    def _on_join_change_succ1(self, client, addr, message_list):
+        """Point to a newly joined successor and announce ourselves to it"""
+        s_1 = str(message_list[1])
+        s_2 = int(message_list[2])
 
-            message = "succ_succ" + " "+ succ1 + " " + succ2
-            client.send(message.encode('utf-8'))
-            client.close()
+        self.successor = (s_1, s_2)
 
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            pred1 = str(self.predecessor[0])
-            pred2 = str(self.predecessor[1])
-            message = "join_change_succ1" + " " + pred1 + " " + pred2
-            soc.connect(ex_pred)
-            soc.send(message.encode('utf-8'))
-            soc.close()
+        #self.successor = (message_list[1], int(message_list[2]))
+        _curr_node = False
+        send_msg = False
+        message = "change_pred_1" + " " + str(self.host) + " " + str(self.port)
 
-        if message_list[0] == "change_pred_1":
-            pred1 = str(message_list[1])
-            pred2 = int(message_list[2])
-            self.predecessor = (pred1, pred2)
-            client.close()
-            
-        if message_list[0] == "change_succ_1":
-            succ1 = str(message_list[1])
-            succ2 = int(message_list[2])
-            self.successor = (succ1, succ2)
-            client.close()
+        if send_msg:
+            _curr_node = True
 
+        soc = connect_to(self.successor)
+        send_message(soc, message)
+        soc.close()
+        client.close()
+    
+    def _on_join_change_pred(self, client, addr, message_list):
+        """Accept a newly joined predecessor and link it to the old one"""
+        ex_pred = self.predecessor
+        p_1 = message_list[1]
+        p_2 = int(message_list[2])
+
+        self.predecessor = (p_1, p_2)
+
+        succ1 = str(self.successor[0])
+        succ2 = str(self.successor[1])
+
+        message = "succ_succ" + " "+ succ1 + " " + succ2
+        send_message(client, message)
+        client.close()
+
+        pred1 = str(self.predecessor[0])
+        pred2 = str(self.predecessor[1])
+        message = "join_change_succ1" + " " + pred1 + " " + pred2
+        soc = connect_to(ex_pred)
+        send_message(soc, message)
+        soc.close()
+    
+    def _on_change_pred_1(self, client, addr, message_list):
+        """Set the predecessor announced by a joining node"""
+        pred1 = str(message_list[1])
+        pred2 = int(message_list[2])
+        self.predecessor = (pred1, pred2)
+        client.close()
+    
+    def _on_change_succ_1(self, client, addr, message_list):
+        """Set the successor announced by a joining node"""
+        succ1 = str(message_list[1])
+        succ2 = int(message_list[2])
+        self.successor = (succ1, succ2)
+        client.close()
+    
     ############################################# ping part 2
-        if message_list[0] == "alive_ping":
-            message = ""
-            if message_list[3] == "yes":
-                message = "alive"
-            else:
-                message = "not_alive"
-
-            client.send(message.encode('utf-8'))
-            client.close()
-
-        if message_list[0] == "suc_suc_change_ping":
-            s_1 = message_list[1]
-            s_2 = int(message_list[2])
+    def _on_alive_ping(self, client, addr, message_list):
+        """Answer a liveness ping from the predecessor"""
+        message = ""
+        if message_list[3] == "yes":
+            message = "alive"
+        else:
+            message = "not_alive"
 
-            self.succ_succ = (s_1, s_2)
-            client.close()
+        send_message(client, message)
+        client.close()
+    
+    def _on_suc_suc_change_ping(self, client, addr, message_list):
+        """Record the successor's successor"""
+        s_1 = message_list[1]
+        s_2 = int(message_list[2])
 
+        self.succ_succ = (s_1, s_2)
+        client.close()
+    
     ############################################################## file put statements
-        if message_list[0] == "put_backup":
-            stored = str(message_list[1])
-            self.backUpFiles.append(stored)
-            client.close()
-
-        if message_list[0] =="lookup_file":
-            client.close()
-
-            file_name = message_list[1]
-            curr_addr = (message_list[3], int(message_list[4]))
-
-            tuple_ret = self.lookup_file(int(message_list[2]), file_name, curr_addr)
-            curr_status = False
-
-            if tuple_ret != (" ", 0):
-                curr_status = True
-
-            else:
-                curr_status = False
-
-            if curr_status:
-                a_1 = str(tuple_ret[0])
-                a_2 = str(tuple_ret[1])
-
-                message = "target_file_spot" + " "+ a_1 + " " + a_2
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                soc.connect(curr_addr)
-                soc.send(message.encode('utf-8'))
-                soc.close()
-
-        if message_list[0] == "target_file_spot":
-            ans1 = message_list[1]
-            ans2 = int(message_list[2])
-            self.file_curr_node = (ans1, ans2)
-            self.file_bool = True
-            client.close()
+    def _on_put_backup(self, client, addr, message_list):
+        """Record a file stored as a backup for the successor"""
+        stored = str(message_list[1])
+        self.backUpFiles.append(stored)
+        client.close()
+    
+    def _on_lookup_file(self, client, addr, message_list):
+        """Resolve the node responsible for storing a file"""
+        client.close()
 
-        if message_list[0] == "put_file":
-            _folder_name = self.host+"_"+str(self.port)
-            path_file = self.host+"_"+str(self.port) + "/" + message_list[1]
+        file_name = message_list[1]
+        curr_addr = (message_list[3], int(message_list[4]))
 
-            file_recv = False
+        tuple_ret = self.lookup_file(int(message_list[2]), file_name, curr_addr)
+        curr_status = False
 
-            num_check = 1
-            while(num_check == 1):
-                try:
-                    self.recieveFile(client, path_file)
-                    file_recv = True
-                except:
-                    file_recv = False
-                    num_check = 0
-                    pass
-
-            mess = ""
-            if file_recv:
-                mess = "no_error_file"
-            else:
-                mess = "error_file"
-
-            self.files.append(message_list[1])
-            
-            # Create index entries for the received file
-            try:
-                filename = message_list[1]
-                words = self.create_file_index_entry(filename)
-                for word in words:
-                    self.store_index_entry(word, filename, words)
-                print(f"Created index entries for received file {filename}: {words}")
-            except Exception as e:
-                print(f"Failed to create index entries for received file {filename}: {e}")
-            
-            # store file in system
-            client.close()
-            x_x = message_list[1]
-            msg = "put_backup" + " " + x_x + " " + mess
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            soc.connect(self.predecessor)
-            soc.send(msg.encode('utf-8'))
-            soc.close()
-
-        ############################################################################# get func file
-        if message_list[0] == "get_lookup_file":
-            client.close()
-            key_of_new_file = int(message_list[2])
-            file_name = message_list[1]
-            curr_addr = (message_list[3], int(message_list[4]))
-            tuple_ret = self.get_file_lookup(key_of_new_file, file_name, curr_addr)
+        if tuple_ret != (" ", 0):
+            curr_status = True
 
+        else:
             curr_status = False
-            if tuple_ret != (" ", 0):
-                curr_status = True
-            else:
-               curr_status = False
-
-            if curr_status:
-                msg_type = "getfunc_file_spot" 
-                conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                ans1 = str(tuple_ret[0])
-                ans2 = str(tuple_ret[1])
-                conn.connect(curr_addr)
-                message = msg_type + " "+ ans1 + " " + ans2
-                conn.send(message.encode('utf-8'))
-                conn.close()
-
-        if message_list[0] == "getfunc_file_spot":
-            self.getfunc_file = (message_list[1], int(message_list[2]))
-            client.close()
-
-        if message_list[0] == "send_file":
-            file = message_list[1]
-
-            # Check if file is in main files
-            if file in self.files:
-                message = "file_found"
-                client.send(message.encode('utf-8'))
-            # Also check if file is in backup files (in case main node left)
-            elif file in self.backUpFiles:
-                message = "file_found"
-                client.send(message.encode('utf-8'))
-                # Move from backup to main files since it's being accessed
-                self.backUpFiles.remove(file)
-                self.files.append(file)
-                print(f"Retrieved file from backup: {file}")
-            else:
-                message = "file_not_found"
-                client.send(message.encode('utf-8'))
-
-            client.close()
-
-        ################################################### file rehashing
-
-        # here we send the rehashed and del from own directory
-        if message_list[0] == "succ_send_files_in_range":
-            file_str = ""
-            new_key = int(message_list[1])
-
-            for file in self.files:
-                file_id = int(self.hasher(file))
 
-                ans = self.range_checker(file_id, new_key, self.key)
-                if ans:
-                    file_str = file_str + " " + file + " "
+        if curr_status:
+            a_1 = str(tuple_ret[0])
+            a_2 = str(tuple_ret[1])
 
-            file_str = file_str.strip()
-
-            client.send(file_str.encode('utf-8'))
-            client.close()
-
-        if message_list[0] == "files_to_del":
-            files_to_del = message_list[1:]
+            message = "target_file_spot" + " "+ a_1 + " " + a_2
+            soc = connect_to(curr_addr)
+            send_message(soc, message)
+            soc.close()
+    
+    def _on_target_file_spot(self, client, addr, message_list):
+        """Record the node found for a file put"""
+        ans1 = message_list[1]
+        ans2 = int(message_list[2])
+        self.file_curr_node = (ans1, ans2)
+        self.file_bool = True
+        client.close()
+    
+    def _on_put_file(self, client, addr, message_list):
+        """Receive a file, index it and ask the predecessor to back it up"""
+        path_file = os.path.join(self.node_dir, message_list[1])
 
-            for file in self.files:
-                if file in files_to_del:
-                    self.files.remove(file)
+        file_recv = False
 
-            client.close()
+        num_check = 1
+        while(num_check == 1):
+            try:
+                self.recieveFile(client, path_file)
+                file_recv = True
+            except:
+                file_recv = False
+                num_check = 0
+                pass
 
-        # asking succ for files to add in backup
-        if message_list[0] == "succ_send_files":
-            file_str = ""
-            file_came = False
+        mess = ""
+        if file_recv:
+            mess = "no_error_file"
+        else:
+            mess = "error_file"
 
-            if len(message_list) > 0:
-                file_came = True
-            else:
-                file_came = False
+        self.files.append(message_list[1])
+        
+        # Create index entries for the received file
+        try:
+            filename = message_list[1]
+            words = self.create_file_index_entry(filename)
+            self.store_index_entries(filename, words)
+            print(f"Created index entries for received file {filename}: {words}")
+        except Exception as e:
+            print(f"Failed to create index entries for received file {filename}: {e}")
+        
+        # store file in system
+        client.close()
+        x_x = message_list[1]
+        msg = "put_backup" + " " + x_x + " " + mess
+        soc = connect_to(self.predecessor)
+        send_message(soc, msg)
+        soc.close()
+    
+    ############################################################################# get func file
+    def _on_get_lookup_file(self, client, addr, message_list):
+        """Resolve the node responsible for a file being fetched"""
+        client.close()
+        key_of_new_file = int(message_list[2])
+        file_name = message_list[1]
+        curr_addr = (message_list[3], int(message_list[4]))
+        tuple_ret = self.get_file_lookup(key_of_new_file, file_name, curr_addr)
+
+        curr_status = False
+        if tuple_ret != (" ", 0):
+            curr_status = True
+        else:
+           curr_status = False
+
+        if curr_status:
+            msg_type = "getfunc_file_spot" 
+            ans1 = str(tuple_ret[0])
+            ans2 = str(tuple_ret[1])
+            conn = connect_to(curr_addr)
+            message = msg_type + " "+ ans1 + " " + ans2
+            send_message(conn, message)
+            conn.close()
+    
+    def _on_getfunc_file_spot(self, client, addr, message_list):
+        """Record the node found for a file get"""
+        self.getfunc_file = (message_list[1], int(message_list[2]))
+        client.close()
+    
+    def _on_send_file(self, client, addr, message_list):
+        """Report whether this node holds a requested file"""
+        file = message_list[1]
+
+        # Check if file is in main files
+        if file in self.files:
+            message = "file_found"
+            send_message(client, message)
+        # Also check if file is in backup files (in case main node left)
+        elif file in self.backUpFiles:
+            message = "file_found"
+            send_message(client, message)
+            # Move from backup to main files since it's being accessed
+            self.backUpFiles.remove(file)
+            self.files.append(file)
+            print(f"Retrieved file from backup: {file}")
+        else:
+            message = "file_not_found"
+            send_message(client, message)
 
-            for file in self.files:
+        client.close()
+    
+    ################################################### file rehashing
+    # here we send the rehashed and del from own directory
+    def _on_succ_send_files_in_range(self, client, addr, message_list):
+        """Send the files a newly joined predecessor now owns"""
+        file_str = ""
+        new_key = int(message_list[1])
+
+        for file in self.files:
+            file_id = int(self.hasher(file))
+
+            ans = self.range_checker(file_id, new_key, self.key)
+            if ans:
                 file_str = file_str + " " + file + " "
 
-            _msg = ""
-            if file_came:
-                _msg = "file_added"
-
-            file_str = file_str.strip()
-            client.send(file_str.encode('utf-8'))
-            client.close()
-
-        if message_list[0] == "file_key_is_xx":
-            _key = self.hasher(message_list[0])
-            client.close()
-
-
-        # asking pred to store succs backup files
-        if message_list[0] == "store_backup_files":
-            file_list = message_list[1:]
-            for file in file_list:
-                self.backUpFiles.append(file)
-            client.close()
-
-        # Handle backup file restoration when a node leaves
-        if message_list[0] == "restore_backup_file":
-            backup_file = message_list[1]
-            if backup_file in self.backUpFiles:
-                # Move from backup to main files
-                self.backUpFiles.remove(backup_file)
-                if backup_file not in self.files:
-                    self.files.append(backup_file)
-                    print(f"Restored backup file: {backup_file}")
-            client.close()
-
-        ####################################################### leave
-        if message_list[0] == "leaving":
-            client.close()
-            pre1 = message_list[1]
-            pre2 = int(message_list[2])
-            self.predecessor = (pre1, pre2)
-            hos = str(self.host)
-            por = str(self.port)
-            su1 = str(self.successor[0])
-            su2 = str(self.successor[1])
-
-            message = "going_change_successor" + " " + hos + " " + por + " " + su1 + " " + su2
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            p_1 = self.predecessor[0]
-            p_2 = self.predecessor[1]
-            soc.connect((p_1, p_2))
-            soc.send(message.encode('utf-8'))
-            soc.close()
-
-        if message_list[0] == "going_change_succ_succ":
-            self.leave_bool = True
-            s_1 = message_list[1]
-            s_2 = int(message_list[2])
-            self.succ_succ =  (s_1, s_2)
-            client.close()
-            self.leave_bool= False
+        file_str = file_str.strip()
 
-        if message_list[0] == "going_change_successor":
-            client.close()
-            suc1 = message_list[1]
-            suc2 = int(message_list[2])
-            self.successor = (suc1, suc2)
-
-            if len(message_list) >= 5:
-                suc_suc1 = message_list[3]
-                suc_suc2 = int(message_list[4])
-                self.succ_succ = (suc_suc1, suc_suc2)
-
-                s_1 = str(self.successor[0])
-                s_2 = str(self.successor[1])
-
-                message = "going_change_succ_succ" + " " + s_1 + " " + s_2
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                try:
-                    soc.connect(self.predecessor)
-                    soc.send(message.encode('utf-8'))
-                    soc.close()
-                except Exception as e:
-                    print(f"Error notifying predecessor: {e}")
-
-        # Handle topology updates from bootstrap server
-        if message_list[0] == "topology_update_pred":
-            pred_host = message_list[1]
-            pred_port = int(message_list[2])
-            self.predecessor = (pred_host, pred_port)
-            print(f"Topology update: New predecessor {self.predecessor}")
-            client.close()
-
-        if message_list[0] == "topology_update_succ":
-            succ_host = message_list[1]
-            succ_port = int(message_list[2])
-            self.successor = (succ_host, succ_port)
-            print(f"Topology update: New successor {self.successor}")
-            client.close()
+        send_message(client, file_str)
+        client.close()
+    
+    def _on_files_to_del(self, client, addr, message_list):
+        """Drop files that were rehashed to another node"""
+        files_to_del = set(message_list[1:])
 
-        if message_list[0] == "leaving_succ_take_files":
-            file_list = message_list[1:]
-            for file in file_list:
-                self.files.append(file)
+        # Rebuild the list in one pass; removing while iterating skipped
+        # the entry after each removed file
+        self.files[:] = [file for file in self.files if file not in files_to_del]
 
-            client.close()
-            new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            new_socket.connect(self.predecessor)
+        client.close()
+    
+    # asking succ for files to add in backup
+    def _on_succ_send_files(self, client, addr, message_list):
+        """Send this node's file list to be backed up"""
+        file_str = ""
+        file_came = False
+
+        if len(message_list) > 0:
+            file_came = True
+        else:
+            file_came = False
 
-            message = "store_backup_files"
-            for file in self.files:
-                message = message + " " + file + " "
+        for file in self.files:
+            file_str = file_str + " " + file + " "
 
-            message = message.strip()
-            new_socket.send(message.encode('utf-8'))
-            new_socket.close()
+        _msg = ""
+        if file_came:
+            _msg = "file_added"
 
+        file_str = file_str.strip()
+        send_message(client, file_str)
+        client.close()
+    
+    def _on_file_key_is_xx(self, client, addr, message_list):
+        """Hash a file key (unused)"""
+        _key = self.hasher(message_list[0])
+        client.close()
+    
+    # asking pred to store succs backup files
+    def _on_store_backup_files(self, client, addr, message_list):
+        """Add the successor's files to the backup list"""
+        self.backUpFiles.extend(message_list[1:])
+        client.close()
+    
+    # Handle backup file restoration when a node leaves
+    def _on_restore_backup_file(self, client, addr, message_list):
+        """Promote a backup file after its owner left"""
+        backup_file = message_list[1]
+        if backup_file in self.backUpFiles:
+            # Move from backup to main files
+            self.backUpFiles.remove(backup_file)
+            if backup_file not in self.files:
+                self.files.append(backup_file)
+                print(f"Restored backup file: {backup_file}")
+        client.close()
+    
+    ####################################################### leave
+    def _on_leaving(self, client, addr, message_list):
+        """Take over from a leaving predecessor"""
+        client.close()
+        pre1 = message_list[1]
+        pre2 = int(message_list[2])
+        self.predecessor = (pre1, pre2)
+        hos = str(self.host)
+        por = str(self.port)
+        su1 = str(self.successor[0])
+        su2 = str(self.successor[1])
+
+        message = "going_change_successor" + " " + hos + " " + por + " " + su1 + " " + su2
+        p_1 = self.predecessor[0]
+        p_2 = self.predecessor[1]
+        soc = connect_to((p_1, p_2))
+        send_message(soc, message)
+        soc.close()
+    
+    def _on_going_change_succ_succ(self, client, addr, message_list):
+        """Record a new successor's successor after a node left"""
+        self.leave_bool = True
+        s_1 = message_list[1]
+        s_2 = int(message_list[2])
+        self.succ_succ =  (s_1, s_2)
+        client.close()
+        self.leave_bool= False
+    
+    def _on_going_change_successor(self, client, addr, message_list):
+        """Take over from a leaving successor"""
+        client.close()
+        suc1 = message_list[1]
+        suc2 = int(message_list[2])
+        self.successor = (suc1, suc2)
+
+        if len(message_list) >= 5:
+            suc_suc1 = message_list[3]
+            suc_suc2 = int(message_list[4])
+            self.succ_succ = (suc_suc1, suc_suc2)
+
+            s_1 = str(self.successor[0])
+            s_2 = str(self.successor[1])
+
+            message = "going_change_succ_succ" + " " + s_1 + " " + s_2
+            try:
+                soc = connect_to(self.predecessor)
+                send_message(soc, message)
+                soc.close()
+            except Exception as e:
+                print(f"Error notifying predecessor: {e}")
+    
+    # Handle topology updates from bootstrap server
+    def _on_topology_update_pred(self, client, addr, message_list):
+        """Apply a predecessor change from the bootstrap server"""
+        pred_host = message_list[1]
+        pred_port = int(message_list[2])
+        self.predecessor = (pred_host, pred_port)
+        print(f"Topology update: New predecessor {self.predecessor}")
+        client.close()
+    
+    def _on_topology_update_succ(self, client, addr, message_list):
+        """Apply a successor change from the bootstrap server"""
+        succ_host = message_list[1]
+        succ_port = int(message_list[2])
+        self.successor = (succ_host, succ_port)
+        print(f"Topology update: New successor {self.successor}")
+        client.close()
+    
+    def _on_leaving_succ_take_files(self, client, addr, message_list):
+        """Take the files of a leaving predecessor and re-back them up"""
+        self.files.extend(message_list[1:])
 
-        ######################################################## file rehashing part 2
+        client.close()
+        new_socket = connect_to(self.predecessor)
 
+        message = "store_backup_files"
+        for file in self.files:
+            message = message + " " + file + " "
 
+        message = message.strip()
+        send_message(new_socket, message)
+        new_socket.close()
+    
 
     def listener(self):
         '''xx'''
@@ -1156,8 +1360,11 @@ class Node:
         node_alive = True
         num_tracer = False
         succ_msg = ""
+        stable_rounds = 0  # Consecutive rounds with a responsive successor and unchanged neighbours
+        last_neighbours = None
 
         while not self.stop:
+            ping_failed = False
 
             if self.leave_bool:
                 node_alive = False
@@ -1168,7 +1375,7 @@ class Node:
                 p_o = str(self.port)
                 message = "alive_ping" + " "+ h_o + " " + p_o + " " + "yes"
 
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                soc = None
                 try:
                     succ_msg = ""
                     # Check if successor is valid before using it
@@ -1179,10 +1386,9 @@ class Node:
                         
                         s_1 = self.successor[0]
                         s_2 = self.successor[1]
-                        soc.settimeout(3.0)  # Set timeout
-                        soc.connect((s_1, s_2))
-                        soc.send(message.encode('utf-8'))
-                        message = soc.recv(1024).decode('utf-8')
+                        soc = connect_to((s_1, s_2), timeout=3.0)
+                        send_message(soc, message)
+                        message = recv_message(soc)
                         succ_msg = message
                         soc.close()
 
@@ -1193,6 +1399,7 @@ class Node:
                         node_alive = True
                         
                 except (socket.timeout, ConnectionRefusedError, OSError) as e:
+                    ping_failed = True
                     print(f"Successor {self.successor} is not responding: {e}")
                     try:
                         soc.close()
@@ -1230,14 +1437,15 @@ class Node:
                         p_o = str(self.port)
 
                         message = "dead_ping" + " " + h_o + " "+ p_o + " " + "no"
-                        conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        conn = None
                         try:
-                            conn.connect(self.successor)
-                            conn.send(message.encode('utf-8'))
+                            conn = connect_to(self.successor)
+                            send_message(conn, message)
                             conn.close()
                         except Exception as e:
                             print(f"Dead ping error: {e}")
-                            conn.close()
+                            if conn:
+                                conn.close()
 
                     if node_alive:
                         message_join = "succ_changed"
@@ -1247,13 +1455,12 @@ class Node:
                     # update your predecessor's consecutive successor
                     if self.predecessor and len(self.predecessor) == 2 and self.successor and len(self.successor) == 2:
                         try:
-                            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                            soc.connect(self.predecessor)
+                            soc = connect_to(self.predecessor)
                             suc1 = str(self.successor[0])
                             suc2 = str(self.successor[1])
 
                             message = "suc_suc_change_ping" + " " + suc1 + " " + suc2 + " " + message_join
-                            soc.send(message.encode('utf-8'))
+                            send_message(soc, message)
                             soc.close()
                         except Exception as e:
                             print(f"Predecessor update error: {e}")
@@ -1261,8 +1468,7 @@ class Node:
                     # Transfer backup files to successor
                     if self.successor and len(self.successor) == 2 and self.backUpFiles:
                         try:
-                            new_conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                            new_conn.connect(self.successor)
+                            new_conn = connect_to(self.successor)
                             file_list = "leaving_succ_take_files"
 
                             for file in self.backUpFiles:
@@ -1270,14 +1476,23 @@ class Node:
 
                             file_list = file_list.strip()
 
-                            new_conn.send(file_list.encode('utf-8'))
+                            send_message(new_conn, file_list)
                             new_conn.close()
                         except Exception as e:
                             print(f"File transfer error: {e}")
                     
+            # Back off while the ring is quiet: each stable round doubles the
+            # 0.5s interval (up to MAX_PING_BACKOFF doublings), any churn resets it
+            neighbours = (self.successor, self.predecessor)
+            if not ping_failed and neighbours == last_neighbours:
+                stable_rounds = min(stable_rounds + 1, MAX_PING_BACKOFF)
+            else:
+                stable_rounds = 0
+            last_neighbours = neighbours
+
             # Sleep in smaller chunks to respond to stop signal faster
-            for _ in range(5):  # 0.5 seconds total, check stop every 0.1s
-                if self.stop:
+            for _ in range(5 << stable_rounds):  # check stop (and neighbour changes) every 0.1s
+                if self.stop or (self.successor, self.predecessor) != neighbours:
                     break
                 time.sleep(0.1)
 
@@ -1291,9 +1506,14 @@ class Node:
     def lookup(self,key, new_node_address):
         '''hh'''
         tuple_ret = (" ", 0)
+
+        # A standalone node is its own successor and owns every key
+        if self.successor == (self.host, self.port):
+            return self.successor
+
         # ask your successor for its key
 
-        successor_key = self.hasher(self.successor[0] + str(self.successor[1]))
+        successor_key = self.node_key(self.successor)
 
         if successor_key > self.key:
             # successor > node's key > self.key
@@ -1302,14 +1522,13 @@ class Node:
                 return self.successor
 
             else:
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 message_code= "lookup"
                 n_0 = str(new_node_address[0])
                 n_1 = str(new_node_address[1])
                 
                 message = message_code + " " + n_0 + " " + n_1 +" " +  str(key)
-                soc.connect(self.successor)
-                soc.send(message.encode('utf-8'))
+                soc = connect_to(self.successor)
+                send_message(soc, message)
                 soc.close()
 
         else: # this is the wrap around case
@@ -1322,9 +1541,8 @@ class Node:
                 n_0 = str(new_node_address[0])
                 n_1 = str(new_node_address[1])
                 message = message_code + " " + n_0 + " " + n_1 +" " +  str(key)
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                soc.connect(self.successor)
-                soc.send(message.encode('utf-8'))
+                soc = connect_to(self.successor)
+                send_message(soc, message)
                 soc.close()
 
         return tuple_ret
@@ -1408,17 +1626,15 @@ class Node:
         """Notify successor and predecessor about the new node"""
         try:
             # Notify successor to update its predecessor
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             message = f"change_pred_1 {self.host} {self.port}"
-            soc.connect(self.successor)
-            soc.send(message.encode('utf-8'))
+            soc = connect_to(self.successor)
+            send_message(soc, message)
             soc.close()
             
             # Notify predecessor to update its successor
-            soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             message = f"change_succ_1 {self.host} {self.port}"
-            soc.connect(self.predecessor)
-            soc.send(message.encode('utf-8'))
+            soc = connect_to(self.predecessor)
+            send_message(soc, message)
             soc.close()
             
         except Exception as e:
@@ -1429,53 +1645,44 @@ class Node:
         try:
             # File rehashing logic - same as original but in separate method
             if self.successor != (self.host, self.port):  # Only if not the only node
-                file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                file_socket.connect(self.successor)
+                file_socket = connect_to(self.successor)
                 hos = self.host
                 por = str(self.port)
                 k_k = str(self.key) 
                 message = "succ_send_files_in_range" + " " + k_k + " " + hos + " " + por
-                file_socket.send(message.encode('utf-8'))
-                message = file_socket.recv(1024).decode('utf-8')
+                send_message(file_socket, message)
+                message = recv_message(file_socket)
                 file_str = message
-                file_list = message.split()
-
-                for file in file_list:
-                    self.files.append(file)
+                self.files.extend(message.split())
 
                 file_socket.close()
 
-                file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                file_socket.connect(self.successor)
+                file_socket = connect_to(self.successor)
                 message = "files_to_del" + " " + file_str
-                file_socket.send(message.encode('utf-8'))
-                message = file_socket.recv(1024).decode('utf-8')
+                send_message(file_socket, message)
+                message = recv_message(file_socket)
                 file_socket.close()
 
                 # ask succ to send its update file list and store it in backup
-                file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                file_socket.connect(self.successor)
+                file_socket = connect_to(self.successor)
                 message = "succ_send_files"
-                file_socket.send(message.encode('utf-8'))
+                send_message(file_socket, message)
                 time.sleep(0.01)
-                message = file_socket.recv(1024).decode('utf-8')
-                file_list = message.split()
-                for file in file_list:
-                    self.backUpFiles.append(file)
+                message = recv_message(file_socket)
+                self.backUpFiles.extend(message.split())
 
                 file_socket.close()
 
                 # send ur updated files to predecessor to store in its backup
                 if self.predecessor != (self.host, self.port):
-                    file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    file_socket.connect(self.predecessor)
+                    file_socket = connect_to(self.predecessor)
                     message = "store_backup_files"
 
                     for file in self.files:
                         message = message + " " + file + " "
 
                     message = message.strip()
-                    file_socket.send(message.encode('utf-8'))
+                    send_message(file_socket, message)
                     file_socket.close()
                     
         except Exception as e:
@@ -1486,16 +1693,17 @@ class Node:
 
     def lookup_file(self, key, File_name, curr_addr):
         '''nn'''
+        # If we're the only node, we're responsible (checked first so a
+        # standalone node skips the successor key hashing below)
+        if self.successor == (self.host, self.port):
+            return curr_addr
+
         # Check if this node is responsible for the key
-        successor_key = self.hasher(self.successor[0] + str(self.successor[1]))
+        successor_key = self.node_key(self.successor)
 
         if self.key == key:
             return curr_addr
 
-        # If we're the only node, we're responsible
-        if self.successor == (self.host, self.port):
-            return curr_addr
-
         if successor_key > self.key:
             # Normal case: successor > self.key
             if key > self.key and key <= successor_key:
@@ -1546,14 +1754,12 @@ class Node:
             file_node = file_node_lookup
 
         # send file
-        new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        new_socket.connect(file_node)
+        new_socket = connect_to(file_node)
         message = "put_file" + " " + fileName
-        new_socket.send(message.encode('utf-8'))
+        send_message(new_socket, message)
         
         # Use full path for the file
-        file_path = self.host+"_"+str(self.port) + "/" + fileName
-        time.sleep(0.5)
+        file_path = os.path.join(self.node_dir, fileName)
         self.sendFile(new_socket, file_path)
         new_socket.close()
 
@@ -1561,9 +1767,14 @@ class Node:
     def get_file_lookup(self, key, File_name, curr_addr):
         '''vv'''
         tuple_ret = (" ", 0)
+
+        # A standalone node is its own successor and owns every key
+        if self.successor == (self.host, self.port):
+            return self.successor
+
         # ask your successor for its key
 
-        successor_key = self.hasher(self.successor[0] + str(self.successor[1]))
+        successor_key = self.node_key(self.successor)
 
         if self.key == key:
             return curr_addr
@@ -1575,11 +1786,10 @@ class Node:
                 return self.successor
 
             else:
-                lookup_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                lookup_socket.connect(self.successor)
+                lookup_socket = connect_to(self.successor)
                 message_code = "get_lookup_file"
                 message = message_code + " " + File_name +" " +  str(key) + " " + curr_addr[0] + " " + str(curr_addr[1])
-                lookup_socket.send(message.encode('utf-8'))
+                send_message(lookup_socket, message)
                 lookup_socket.close()
 
         else: # this is the wrap around case
@@ -1588,11 +1798,10 @@ class Node:
                 return self.successor
 
             else:
-                lookup_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                lookup_socket.connect(self.successor)
+                lookup_socket = connect_to(self.successor)
                 message_code = "get_lookup_file"
                 message = message_code + " " + File_name +" " +  str(key) + " " + curr_addr[0] + " " + str(curr_addr[1])
-                lookup_socket.send(message.encode('utf-8'))
+                send_message(lookup_socket, message)
                 lookup_socket.close()
 
         return tuple_ret
@@ -1636,15 +1845,14 @@ class Node:
             return None
 
         try:
-            new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            new_socket.connect(file_node)
+            new_socket = connect_to(file_node)
             message = "send_file" + " " + fileName + " " + self.host + " " + str(self.port)
-            new_socket.send(message.encode('utf-8'))
+            send_message(new_socket, message)
 
-            msg = new_socket.recv(1024).decode('utf-8')
+            msg = recv_message(new_socket)
             msg_list = msg.split()
 
-            _path_file = self.host+"_"+str(self.port) + "/" + fileName
+            _path_file = os.path.join(self.node_dir, fileName)
 
             if msg_list[0] == "file_found":
                 new_socket.close()
@@ -1660,8 +1868,8 @@ class Node:
             return None
 
 
-    def search(self, search_term):
-        """Search for files by word in their names"""
+    def search(self, search_term, limit=None):
+        """Search for files by word in their names, optionally keeping only the best `limit` matches"""
         search_words = self.extract_words_from_filename(search_term)
         if not search_words:
             print("No valid search words found")
@@ -1669,20 +1877,49 @@ class Node:
         
         print(f"Searching for files containing words: {search_words}")
         
+        # Repeated queries within the TTL skip the index lookups entirely
+        cache_key = tuple(search_words)
+        cached = self.get_cached_search(cache_key)
+        if cached is not None:
+            # Cached entries are immutable; give each caller its own lists
+            results = [(filename, list(matching_words)) for filename, matching_words in cached]
+            if limit is not None:
+                return heapq.nlargest(limit, results, key=lambda item: len(item[1]))
+            return results
+        
         all_results = {}  # {filename: [matching_words]}
+        complete = True
+        fallbacks = []  # Words answered from the local index because their node was unreachable
+        
+        # Each word's index may live on a different node, so look the words
+        # up concurrently and let the network round trips overlap
+        # A standalone node answers every lookup locally, so it skips the pool
+        if len(search_words) > 1 and self.successor != (self.host, self.port):
+            futures = [self.rpc_pool.submit(self.search_word_in_index, word, fallbacks) for word in search_words]
+        else:
+            futures = None
         
-        # Search for each word
-        for word in search_words:
+        # Merge the results for each word, keeping the order of the search words
+        for i, word in enumerate(search_words):
             try:
-                word_results = self.search_word_in_index(word)
+                word_results = futures[i].result() if futures else self.search_word_in_index(word, fallbacks)
                 for filename, all_words in word_results:
-                    if filename not in all_results:
-                        all_results[filename] = []
-                    all_results[filename].append(word)
+                    all_results.setdefault(filename, []).append(word)
                     
             except Exception as e:
+                complete = False
                 print(f"Error searching for word '{word}': {e}")
         
+        # Partial results from a failed or fallen-back lookup are not cached. The
+        # cached copy is built from tuples so callers mutating their results cannot change it
+        if complete and not fallbacks:
+            self.cache_search(cache_key, tuple((filename, tuple(matching_words))
+                                               for filename, matching_words in all_results.items()))
+        
+        # Keep the files matching the most search words without sorting every hit
+        if limit is not None:
+            return heapq.nlargest(limit, all_results.items(), key=lambda item: len(item[1]))
+        
         # Convert results to list format
         final_results = []
         for filename, matching_words in all_results.items():
@@ -1701,41 +1938,10 @@ class Node:
         # First transfer index entries to preserve search functionality
         self.transfer_index_entries_before_leaving()
         
-        # Distribute files randomly between successor and predecessor
-        import random
-        
-        for i, file_name in enumerate(self.files):
-            try:
-                file_path = os.path.join(f"{self.host}_{self.port}", file_name)
-                if os.path.exists(file_path):
-                    # Randomly choose successor or predecessor
-                    if random.choice([True, False]) and self.predecessor != (self.host, self.port):
-                        target_node = self.predecessor
-                        target_name = "predecessor"
-                    else:
-                        target_node = self.successor
-                        target_name = "successor"
-                    
-                    print(f"Transferring {file_name} to {target_name} {target_node}")
-                    
-                    # Transfer the actual file
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(10.0)
-                    sock.connect(target_node)
-                    
-                    message = f"put_file {file_name}"
-                    sock.send(message.encode('utf-8'))
-                    
-                    time.sleep(0.2)  # Small delay
-                    self.sendFile(sock, file_path)
-                    sock.close()
-                    
-                    print(f"Successfully transferred {file_name} to {target_node}")
-                    
-            except Exception as e:
-                print(f"Failed to transfer {file_name}: {e}")
-                # Continue with other files
-                continue
+        # Distribute files randomly between successor and predecessor. Each
+        # transfer waits on its own connection, so run them concurrently
+        transferred = sum(self.rpc_pool.map(self.transfer_file_before_leaving, list(self.files)))
+        print(f"Transferred {transferred} of {len(self.files)} files")
         
         # Also send backup files to ensure they don't get lost
         if self.backUpFiles:
@@ -1743,14 +1949,47 @@ class Node:
             try:
                 for backup_file in self.backUpFiles:
                     # Try to send backup files to successor
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.connect(self.successor)
+                    sock = connect_to(self.successor)
                     message = f"restore_backup_file {backup_file}"
-                    sock.send(message.encode('utf-8'))
+                    send_message(sock, message)
                     sock.close()
             except Exception as e:
                 print(f"Failed to transfer backup files: {e}")
 
+    def transfer_file_before_leaving(self, file_name):
+        """Hand one file to the successor or predecessor, returning whether it was sent"""
+        try:
+            file_path = os.path.join(self.node_dir, file_name)
+            if not os.path.exists(file_path):
+                return False
+            
+            # Randomly choose successor or predecessor
+            if random.choice([True, False]) and self.predecessor != (self.host, self.port):
+                target_node = self.predecessor
+                target_name = "predecessor"
+            else:
+                target_node = self.successor
+                target_name = "successor"
+            
+            print(f"Transferring {file_name} to {target_name} {target_node}")
+            
+            # Transfer the actual file
+            sock = connect_to(target_node, timeout=10.0)
+            
+            message = f"put_file {file_name}"
+            send_message(sock, message)
+            
+            self.sendFile(sock, file_path)
+            sock.close()
+            
+            print(f"Successfully transferred {file_name} to {target_node}")
+            return True
+            
+        except Exception as e:
+            print(f"Failed to transfer {file_name}: {e}")
+            # Continue with other files
+            return False
+
     def transfer_index_entries_before_leaving(self):
         """Transfer all index entries to appropriate nodes before leaving"""
         if not self.file_index:
@@ -1758,36 +1997,46 @@ class Node:
             return
             
         print(f"Transferring {len(self.file_index)} index entries before leaving...")
-        transferred_count = 0
         
-        for word, entries in self.file_index.items():
-            try:
-                # Find the new responsible node for this word
-                word_key = self.hasher(word.lower())
-                responsible_node = self.find_responsible_node_for_key(word_key)
-                
-                # Skip if this node would still be responsible (shouldn't happen when leaving)
-                if responsible_node == (self.host, self.port):
-                    continue
-                
-                # Transfer each index entry for this word
-                for filename, all_words in entries:
-                    try:
-                        self.send_index_entry_to_node(word, filename, all_words, responsible_node)
-                        transferred_count += 1
-                        print(f"✅ Transferred index: '{word}' → {responsible_node} (file: {filename})")
-                        self.logger.debug(f"Transferred index entry for word '{word}' (file: {filename}) to node {responsible_node}")
-                    except Exception as e:
-                        self.logger.error(f"Failed to transfer index entry for word '{word}': {e}")
-                        print(f"❌ Failed to transfer index: '{word}' → {responsible_node}: {e}")
-                        
-            except Exception as e:
-                self.logger.error(f"Failed to find responsible node for word '{word}': {e}")
-                print(f"Failed to find responsible node for word '{word}': {e}")
+        # Words are handed off independently, so send them concurrently rather
+        # than paying one connection round trip after another
+        with self.index_lock:
+            word_entries = [(word, list(entries)) for word, entries in self.file_index.items()]
+        transferred_count = sum(self.rpc_pool.map(lambda item: self.transfer_word_index_entries(*item), word_entries))
         
         print(f"Successfully transferred {transferred_count} index entries")
         self.logger.info(f"Transferred {transferred_count} index entries before leaving")
 
+    def transfer_word_index_entries(self, word, entries):
+        """Transfer the index entries of one word to its new responsible node, returning how many were sent"""
+        transferred_count = 0
+        try:
+            # Find the new responsible node for this word
+            word_key = self.hasher(word.lower())
+            responsible_node = self.find_responsible_node_for_key(word_key)
+            
+            # Skip if this node would still be responsible (shouldn't happen when leaving)
+            if responsible_node == (self.host, self.port):
+                return 0
+            
+            # Transfer each index entry for this word
+            for filename in entries:
+                all_words = self.index_words.get(filename, [])
+                try:
+                    self.send_index_entry_to_node(word, filename, all_words, responsible_node)
+                    transferred_count += 1
+                    print(f"✅ Transferred index: '{word}' → {responsible_node} (file: {filename})")
+                    self.logger.debug(f"Transferred index entry for word '{word}' (file: {filename}) to node {responsible_node}")
+                except Exception as e:
+                    self.logger.error(f"Failed to transfer index entry for word '{word}': {e}")
+                    print(f"❌ Failed to transfer index: '{word}' → {responsible_node}: {e}")
+                    
+        except Exception as e:
+            self.logger.error(f"Failed to find responsible node for word '{word}': {e}")
+            print(f"Failed to find responsible node for word '{word}': {e}")
+        
+        return transferred_count
+
     def leave(self):
         '''bb'''
         self.leave_bool = True
@@ -1807,19 +2056,19 @@ class Node:
         # Original leave protocol - notify successor about topology change
         if self.successor != (self.host, self.port):  # Only if not the only node
             try:
-                soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                soc.connect(self.successor)
+                soc = connect_to(self.successor)
 
                 pred1 = str(self.predecessor[0]) 
                 pred2 = str(self.predecessor[1])
                 msg_code = "leaving" 
 
                 message = msg_code + " " + pred1 + " " + pred2
-                soc.send(message.encode('utf-8'))
+                send_message(soc, message)
                 soc.close()
             except Exception as e:
                 print(f"Failed to notify successor: {e}")
 
+        self.rpc_pool.shutdown(wait=False)
         self.kill()
 
     def quit_with_transfer(self):
@@ -1840,31 +2089,36 @@ class Node:
         
         # Don't do the topology notification protocol for quit (faster exit)
         # Just kill the node
+        self.rpc_pool.shutdown(wait=False)
         self.kill()
 
 
     def sendFile(self, soc, fileName):
         '''vv'''
         fileSize = os.path.getsize(fileName)
-        soc.send(str(fileSize).encode('utf-8'))
-        soc.recv(1024).decode('utf-8')
+        send_message(soc, str(fileSize))
+        recv_message(soc)
+        # socket.sendfile lets the kernel copy the file straight to the socket
+        # (os.sendfile), falling back to buffered sends where unsupported
         with open(fileName, "rb") as file:
-            contentChunk = file.read(1024)
-            while contentChunk!="".encode('utf-8'):
-                soc.send(contentChunk)
-                contentChunk = file.read(1024)
+            soc.sendfile(file)
 
     def recieveFile(self, soc, fileName):
         '''ggg'''
-        fileSize = int(soc.recv(1024).decode('utf-8'))
-        soc.send("ok".encode('utf-8'))
+        fileSize = int(recv_message(soc))
+        send_message(soc, "ok")
         contentRecieved = 0
-        file = open(fileName, "wb")
-        while contentRecieved < fileSize:
-            contentChunk = soc.recv(1024)
-            contentRecieved += len(contentChunk)
-            file.write(contentChunk)
-        file.close()
+        buf = _acquire_buffer()
+        try:
+            with open(fileName, "wb") as file, memoryview(buf) as view:
+                while contentRecieved < fileSize:
+                    chunk_size = soc.recv_into(view, min(len(buf), fileSize - contentRecieved))
+                    if not chunk_size:
+                        raise ConnectionError("Connection closed before the file was fully received")
+                    contentRecieved += chunk_size
+                    file.write(view[:chunk_size])
+        finally:
+            _release_buffer(buf)
 
     def kill(self):
         '''vv'''
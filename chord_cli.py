@@ -2,17 +2,102 @@
 
 import sys
 import time
+import itertools
 from chord import Node
 import logging
 
+def cmd_put(node, command):
+    """Store a file"""
+    filename = command[1]
+    try:
+        node.put(filename)
+        print(f"File '{filename}' stored successfully")
+    except Exception as e:
+        print(f"Error storing file: {e}")
+
+def cmd_get(node, command):
+    """Retrieve a file"""
+    filename = command[1]
+    try:
+        result = node.get(filename)
+        if result:
+            print(f"File '{filename}' retrieved successfully")
+        else:
+            print(f"File '{filename}' not found")
+    except Exception as e:
+        print(f"Error retrieving file: {e}")
+
+def cmd_search(node, command):
+    """Search for files by name"""
+    search_term = command[1]
+    try:
+        results = node.search(search_term)
+        if results:
+            print(f"Found {len(results)} files matching '{search_term}':")
+            # Build the listing once and write it in a single call
+            sys.stdout.write("\n".join(
+                f"  {i}. {filename} (matched words: {', '.join(matching_words)})"
+                for i, (filename, matching_words) in enumerate(results, 1)) + "\n")
+        else:
+            print(f"No files found matching '{search_term}'")
+    except Exception as e:
+        print(f"Error searching files: {e}")
+
+def cmd_status(node, command):
+    """Show node status"""
+    # Take the first few index words under the index lock, so handler threads
+    # cannot resize the index mid-iteration and nothing else gets copied
+    with node.index_lock:
+        index_preview = {word: list(files) for word, files in itertools.islice(node.file_index.items(), 5)}
+        index_more = '...' if len(node.file_index) > 5 else ''
+    
+    print("\n".join([
+        f"Node Key: {node.key}",
+        f"Successor: {node.successor}",
+        f"Predecessor: {node.predecessor}",
+        f"Files: {node.files}",
+        f"Backup Files: {node.backUpFiles}",
+        f"File Index: {index_preview}{index_more}",
+        f"Bootstrap Server: {node.bootstrap_host}:{node.bootstrap_port}",
+        f"Stop flag: {node.stop}",
+        f"Leave flag: {node.leave_bool}",
+    ]))
+
+def cmd_leave(node, command):
+    """Leave the network, ending the command loop"""
+    print("Leaving network...")
+    node.leave()
+    print("Node left network successfully")
+    return True
+
+def cmd_quit(node, command):
+    """Transfer files and shut down, ending the command loop"""
+    print("Shutting down node and transferring files...")
+    node.quit_with_transfer()
+    print("Node shutdown complete")
+    return True
+
+# {command: (handler, required word count or None for any)}
+COMMANDS = {
+    "put": (cmd_put, 2),
+    "get": (cmd_get, 2),
+    "search": (cmd_search, 2),
+    "status": (cmd_status, None),
+    "leave": (cmd_leave, None),
+    "quit": (cmd_quit, None),
+    "exit": (cmd_quit, None),
+}
+
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python3 chord_cli.py <host> <port> [bootstrap_host] [bootstrap_port]")
+        print("Usage: python3 chord_cli.py <host> <port> [bootstrap_host] [bootstrap_port] [rpc_workers]")
         print("Examples:")
         print("  # Start node with default bootstrap server (localhost:5000):")
         print("  python3 chord_cli.py localhost 8001")
         print("  # Start node with custom bootstrap server:")
         print("  python3 chord_cli.py localhost 8002 localhost 5000")
+        print("  # Use 8 RPC worker threads for searches and leave hand-offs:")
+        print("  python3 chord_cli.py localhost 8003 localhost 5000 8")
         sys.exit(1)
     
     host = sys.argv[1]
@@ -27,10 +112,13 @@ def main():
     if len(sys.argv) >= 5:
         bootstrap_port = int(sys.argv[4])
     
+    # RPC worker pool size (defaults to CHORD_RPC_WORKERS or the CPU count)
+    rpc_workers = int(sys.argv[5]) if len(sys.argv) >= 6 else None
+    
     # Create node
     print(f"Creating node at {host}:{port}")
     print(f"Bootstrap server: {bootstrap_host}:{bootstrap_port}")
-    node = Node(host, port, bootstrap_host, bootstrap_port)
+    node = Node(host, port, bootstrap_host, bootstrap_port, rpc_workers=rpc_workers)
     
     # Join network through bootstrap server
     print("Joining network through bootstrap server...")
@@ -58,63 +146,15 @@ def main():
             if not command:
                 continue
                 
-            if command[0] == "put" and len(command) == 2:
-                filename = command[1]
-                try:
-                    node.put(filename)
-                    print(f"File '{filename}' stored successfully")
-                except Exception as e:
-                    print(f"Error storing file: {e}")
-                    
-            elif command[0] == "get" and len(command) == 2:
-                filename = command[1]
-                try:
-                    result = node.get(filename)
-                    if result:
-                        print(f"File '{filename}' retrieved successfully")
-                    else:
-                        print(f"File '{filename}' not found")
-                except Exception as e:
-                    print(f"Error retrieving file: {e}")
-                    
-            elif command[0] == "search" and len(command) == 2:
-                search_term = command[1]
-                try:
-                    results = node.search(search_term)
-                    if results:
-                        print(f"Found {len(results)} files matching '{search_term}':")
-                        for i, (filename, matching_words) in enumerate(results, 1):
-                            print(f"  {i}. {filename} (matched words: {', '.join(matching_words)})")
-                    else:
-                        print(f"No files found matching '{search_term}'")
-                except Exception as e:
-                    print(f"Error searching files: {e}")
-                    
-            elif command[0] == "status":
-                print(f"Node Key: {node.key}")
-                print(f"Successor: {node.successor}")
-                print(f"Predecessor: {node.predecessor}")
-                print(f"Files: {node.files}")
-                print(f"Backup Files: {node.backUpFiles}")
-                print(f"File Index: {dict(list(node.file_index.items())[:5])}{'...' if len(node.file_index) > 5 else ''}")
-                print(f"Bootstrap Server: {node.bootstrap_host}:{node.bootstrap_port}")
-                print(f"Stop flag: {node.stop}")
-                print(f"Leave flag: {node.leave_bool}")
-                
-            elif command[0] == "leave":
-                print("Leaving network...")
-                node.leave()
-                print("Node left network successfully")
-                break
-                
-            elif command[0] in ["quit", "exit"]:
-                print("Shutting down node and transferring files...")
-                node.quit_with_transfer()
-                print("Node shutdown complete")
-                break
-                
-            else:
+            # Look the command up instead of testing each name in turn
+            entry = COMMANDS.get(command[0])
+            if entry is None or (entry[1] is not None and len(command) != entry[1]):
                 print("Unknown command. Available commands: put, get, search, status, leave, quit")
+                continue
+            
+            handler = entry[0]
+            if handler(node, command):
+                break
                 
     except KeyboardInterrupt:
         print("\nShutting down node and transferring files...")
@@ -140,7 +140,10 @@ class ChordMetrics:
         self.query_contexts = {}  # Track ongoing queries
         self.message_count = 0
         self.total_processing_time = 0.0
-        self.lock = threading.Lock()
+        # Separate locks so query bookkeeping and message cost updates,
+        # which run on different threads, do not wait on each other
+        self.query_lock = threading.Lock()  # Guards query_contexts
+        self.cost_lock = threading.Lock()  # Guards message_count and total_processing_time
         
         # Cost calculation parameters (configurable)
         self.alpha = 1.0  # Hop count weight
@@ -148,6 +151,9 @@ class ChordMetrics:
         self.delta = 0.1   # Message count weight
         self.zeta = 10.0   # Processing time weight
         
+        # Node cost is computed when Prometheus scrapes it rather than on every message
+        self.node_cost.labels(node_id=self.node_id).set_function(self.calculate_node_cost)
+        
         # Start metrics server if port specified
         if self.metrics_port:
             self.start_metrics_server()
@@ -176,7 +182,7 @@ class ChordMetrics:
         if not self.enabled:
             return
             
-        with self.lock:
+        with self.query_lock:
             self.query_contexts[query_id] = {
                 'start_time': time.time(),
                 'query_type': query_type,
@@ -188,7 +194,7 @@ class ChordMetrics:
         if not self.enabled:
             return
             
-        with self.lock:
+        with self.query_lock:
             if query_id in self.query_contexts:
                 self.query_contexts[query_id]['hop_count'] += 1
     
@@ -197,38 +203,39 @@ class ChordMetrics:
         if not self.enabled:
             return
             
-        with self.lock:
-            if query_id not in self.query_contexts:
-                return
-                
-            context = self.query_contexts.pop(query_id)
-            latency = time.time() - context['start_time']
-            hop_count = context['hop_count']
-            query_type = context['query_type']
-            
-            # Record metrics
-            self.query_latency.labels(
-                node_id=self.node_id,
-                query_type=query_type
-            ).observe(latency)
-            
-            self.query_hop_count.labels(
-                node_id=self.node_id,
-                query_type=query_type
-            ).observe(hop_count)
-            
-            self.query_total.labels(
-                node_id=self.node_id,
-                query_type=query_type,
-                status=status
-            ).inc()
-            
-            # Calculate and record query cost
-            query_cost = self.alpha * hop_count + self.beta * latency
-            self.query_cost.labels(
-                node_id=self.node_id,
-                query_type=query_type
-            ).observe(query_cost)
+        with self.query_lock:
+            context = self.query_contexts.pop(query_id, None)
+        if context is None:
+            return
+        
+        # Prometheus metrics are thread-safe, so record them outside the lock
+        latency = time.time() - context['start_time']
+        hop_count = context['hop_count']
+        query_type = context['query_type']
+        
+        # Record metrics
+        self.query_latency.labels(
+            node_id=self.node_id,
+            query_type=query_type
+        ).observe(latency)
+        
+        self.query_hop_count.labels(
+            node_id=self.node_id,
+            query_type=query_type
+        ).observe(hop_count)
+        
+        self.query_total.labels(
+            node_id=self.node_id,
+            query_type=query_type,
+            status=status
+        ).inc()
+        
+        # Calculate and record query cost
+        query_cost = self.alpha * hop_count + self.beta * latency
+        self.query_cost.labels(
+            node_id=self.node_id,
+            query_type=query_type
+        ).observe(query_cost)
     
     # Message Traffic Tracking
     def record_message_sent(self, message_type, target_node):
@@ -242,9 +249,8 @@ class ChordMetrics:
             target_node=target_node
         ).inc()
         
-        with self.lock:
+        with self.cost_lock:
             self.message_count += 1
-            self.update_node_cost()
     
     def record_message_received(self, message_type, source_node):
         """Record a received message"""
@@ -267,9 +273,8 @@ class ChordMetrics:
             message_type=message_type
         ).observe(processing_time)
         
-        with self.lock:
+        with self.cost_lock:
             self.total_processing_time += processing_time
-            self.update_node_cost()
     
     # Node State Tracking
     def update_neighbors_count(self, count):
@@ -302,14 +307,10 @@ class ChordMetrics:
         self.index_entries.labels(node_id=self.node_id).set(index_count)
         self.backup_files.labels(node_id=self.node_id).set(backup_count)
     
-    def update_node_cost(self):
-        """Update calculated node cost"""
-        if not self.enabled:
-            return
-            
+    def calculate_node_cost(self):
+        """Calculate node cost (read by the node_cost gauge at scrape time)"""
         # Calculate node cost: δ × messages + ζ × processing_time
-        node_cost = self.delta * self.message_count + self.zeta * self.total_processing_time
-        self.node_cost.labels(node_id=self.node_id).set(node_cost)
+        return self.delta * self.message_count + self.zeta * self.total_processing_time
     
     # Context managers for easy timing
     def time_query(self, query_type):
@@ -323,6 +324,9 @@ class ChordMetrics:
 class QueryTimer:
     """Context manager for query timing"""
     
+    # One timer is created per query, so skip the per-instance __dict__
+    __slots__ = ('metrics', 'query_type', 'query_id')
+    
     def __init__(self, metrics, query_type):
         self.metrics = metrics
         self.query_type = query_type
@@ -345,6 +349,9 @@ class QueryTimer:
 class MessageTimer:
     """Context manager for message processing timing"""
     
+    # One timer is created per handled message, so skip the per-instance __dict__
+    __slots__ = ('metrics', 'message_type', 'start_time')
+    
     def __init__(self, metrics, message_type):
         self.metrics = metrics
         self.message_type = message_type
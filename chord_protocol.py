@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Message framing for the Chord DHT socket protocol
+Each message is sent as a 4-byte big-endian length followed by the UTF-8 payload
+"""
+
+import socket
+import struct
+
+FRAME_HEADER = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # Reject frames larger than this (16MB)
+
+
+def send_message(sock, message):
+    """Send one length-prefixed message"""
+    payload = message.encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    """Read exactly size bytes, raising ConnectionError if the peer closes early"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError(f"Connection closed after {received} of {size} bytes")
+        received += n
+    return bytes(buf)
+
+
+def recv_message(sock):
+    """Receive one length-prefixed message, or "" if the peer closed without sending one"""
+    first = sock.recv(FRAME_HEADER.size)
+    if not first:
+        return ""
+    # The header itself may arrive split across reads
+    header = first + recv_exact(sock, FRAME_HEADER.size - len(first))
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    return recv_exact(sock, size).decode('utf-8')
+
+
+def configure_socket(sock):
+    """Disable Nagle's algorithm so small request/reply messages are sent immediately"""
+    # The options are only a tuning hint: a peer that already reset the
+    # connection can make setsockopt fail (EINVAL on macOS), and the next
+    # read or write on the socket reports that properly
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except OSError:
+        pass
+    return sock
+
+
+def connect_to(addr, timeout=None):
+    """Open a TCP connection to a (host, port) address"""
+    return configure_socket(socket.create_connection(addr, timeout=timeout))
@@ -12,6 +12,8 @@ import hashlib
 import threading
 import time
 import socket
+import functools
+import tempfile
 from datetime import datetime
 from flask import Flask, request, jsonify, send_file, abort
 from werkzeug.utils import secure_filename
@@ -20,14 +22,17 @@ from werkzeug.exceptions import BadRequest
 # Import Chord components
 from chord import Node as ChordNode
 from bootstrap_server import BootstrapServer
+from chord_protocol import connect_to, send_message, recv_message
 
 class ChordRESTAPI:
-    def __init__(self, node_host='localhost', node_port=8000, api_port=5001, bootstrap_host='localhost', bootstrap_port=5000):
+    def __init__(self, node_host='localhost', node_port=8000, api_port=5001, bootstrap_host='localhost', bootstrap_port=5000, rpc_workers=None):
         self.node_host = node_host
         self.node_port = node_port
         self.api_port = api_port
         self.bootstrap_host = bootstrap_host
         self.bootstrap_port = bootstrap_port
+        self.rpc_workers = rpc_workers  # RPC pool size for the node (None uses the node's default)
+        self.node_dir = f"{node_host}_{node_port}"  # Chord node's file directory
         
         # Setup logging
         self.setup_logging()
@@ -35,10 +40,26 @@ class ChordRESTAPI:
         # Initialize Flask app
         self.app = Flask(__name__)
         self.app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+
+        # Serialize responses compactly and without re-sorting every dict's keys
+        if hasattr(self.app, 'json'):  # Flask >= 2.2 JSON provider
+            self.app.json.sort_keys = False
+            self.app.json.compact = True
+        else:
+            self.app.config['JSON_SORT_KEYS'] = False
+            self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        
+        # Static part of the /health response, copied per request
+        self.health_template = {
+            'status': 'healthy',
+            'node': f"{self.node_host}:{self.node_port}",
+            'api_port': self.api_port
+        }
         
         # Initialize Chord node
         self.chord_node = None
         self.node_thread = None
+        self.node_metrics = None  # Resolved once the node starts
         
         # Shutdown mechanism
         self.shutdown_requested = False
@@ -82,7 +103,9 @@ class ChordRESTAPI:
     def start_chord_node(self):
         """Start the Chord node in a separate thread"""
         try:
-            self.chord_node = ChordNode(self.node_host, self.node_port, self.bootstrap_host, self.bootstrap_port)
+            self.chord_node = ChordNode(self.node_host, self.node_port, self.bootstrap_host, self.bootstrap_port,
+                                        rpc_workers=self.rpc_workers)
+            self.node_metrics = getattr(self.chord_node, 'metrics', None)
             success = self.chord_node.join(None)  # Join network through bootstrap server
             
             if not success:
@@ -98,24 +121,30 @@ class ChordRESTAPI:
     def setup_routes(self):
         """Setup Flask routes"""
         
+        def requires_node(handler):
+            """Reject requests with 503 until the Chord node has been started"""
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                if not self.chord_node:
+                    return jsonify({'error': 'Chord node not initialized'}), 503
+                return handler(*args, **kwargs)
+            return wrapper
+        
         @self.app.route('/health', methods=['GET'])
         def health_check():
             """Health check endpoint"""
-            return jsonify({
-                'status': 'healthy',
-                'timestamp': datetime.now().isoformat(),
-                'node': f"{self.node_host}:{self.node_port}",
-                'api_port': self.api_port
-            })
+            health = self.health_template.copy()
+            health['timestamp'] = datetime.now().isoformat()
+            return jsonify(health)
         
         @self.app.route('/metrics', methods=['GET'])
         def get_metrics():
             """Prometheus metrics endpoint"""
             try:
-                if not self.chord_node or not hasattr(self.chord_node, 'metrics') or not self.chord_node.metrics:
+                if not self.node_metrics:
                     return "# Metrics not available - prometheus_client not installed or metrics disabled\n", 200, {'Content-Type': 'text/plain'}
                 
-                metrics_data = self.chord_node.metrics.get_metrics()
+                metrics_data = self.node_metrics.get_metrics()
                 return metrics_data, 200, {'Content-Type': 'text/plain'}
                 
             except Exception as e:
@@ -123,12 +152,10 @@ class ChordRESTAPI:
                 return f"# Error retrieving metrics: {e}\n", 500, {'Content-Type': 'text/plain'}
         
         @self.app.route('/upload', methods=['POST'])
+        @requires_node
         def upload_file():
             """Upload a file to the Chord network"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
                 if 'file' not in request.files:
                     return jsonify({'error': 'No file provided'}), 400
                 
@@ -141,35 +168,45 @@ class ChordRESTAPI:
                 if not filename:
                     return jsonify({'error': 'Invalid filename'}), 400
                 
-                # Save file to uploads directory
-                file_path = os.path.join(self.uploads_dir, filename)
-                file.save(file_path)
-                
-                # Move the file to the node directory (same as manual file discovery)
-                node_dir = f"{self.node_host}_{self.node_port}"
-                if not os.path.exists(node_dir):
-                    os.makedirs(node_dir)
+                # Place the file in the node directory (same as manual file discovery)
+                node_dir = self.node_dir
+                os.makedirs(node_dir, exist_ok=True)
                 
                 node_file_path = os.path.join(node_dir, filename)
                 
-                # If file already exists in node directory, create a backup
-                if os.path.exists(node_file_path):
-                    import shutil
-                    backup_name = f"{filename}.backup.{int(time.time())}"
-                    backup_path = os.path.join(node_dir, backup_name)
-                    shutil.move(node_file_path, backup_path)
-                    self.logger.info(f"Backed up existing file to {backup_name}")
-                
-                # Move uploaded file to node directory for automatic discovery
-                import shutil
-                shutil.move(file_path, node_file_path)
+                # Stream the upload straight into the node directory under a hidden
+                # name (file discovery skips dotfiles), so the content is written
+                # once instead of being staged in the uploads directory and copied.
+                # The name is unique so concurrent uploads of one file never share it
+                fd, partial_path = tempfile.mkstemp(dir=node_dir, prefix=f".{filename}.", suffix=".part")
+                try:
+                    with os.fdopen(fd, 'wb') as partial_file:
+                        file.save(partial_file)
+                    os.chmod(partial_path, 0o644)  # mkstemp creates the file owner-only
+                    file_size = os.path.getsize(partial_path)
+                    
+                    # If file already exists in node directory, create a backup
+                    if os.path.exists(node_file_path):
+                        import shutil
+                        backup_name = f"{filename}.backup.{int(time.time())}"
+                        backup_path = os.path.join(node_dir, backup_name)
+                        shutil.move(node_file_path, backup_path)
+                        self.logger.info(f"Backed up existing file to {backup_name}")
+                    
+                    # Publish the completed upload for automatic discovery
+                    os.replace(partial_path, node_file_path)
+                except Exception:
+                    # Discovery never sees dotfiles, so a failed upload would
+                    # otherwise leave its partial file behind for good
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    raise
                 
                 # The file will be automatically discovered by the node's file discovery process
                 # Wait a moment for discovery to happen
                 time.sleep(1)
                 
                 # Get file info
-                file_size = os.path.getsize(node_file_path)
                 file_hash = self.chord_node.hasher(filename)
                 
                 self.logger.info(f"File uploaded successfully: {filename} ({file_size} bytes)")
@@ -187,18 +224,20 @@ class ChordRESTAPI:
                 return jsonify({'error': str(e)}), 500
         
         @self.app.route('/search', methods=['GET'])
+        @requires_node
         def search_files():
             """Search for files in the Chord network"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
                 query = request.args.get('q', '').strip()
                 if not query:
                     return jsonify({'error': 'Search query is required'}), 400
                 
+                limit = request.args.get('limit', type=int)
+                if limit is not None and limit < 0:
+                    return jsonify({'error': 'limit must be non-negative'}), 400
+                
                 # Perform distributed search using the search method
-                results = self.chord_node.search(query)
+                results = self.chord_node.search(query, limit=limit)
                 
                 self.logger.info(f"Search performed: '{query}' - {len(results)} results")
                 
@@ -214,19 +253,17 @@ class ChordRESTAPI:
                 return jsonify({'error': str(e)}), 500
         
         @self.app.route('/download/<filename>', methods=['GET'])
+        @requires_node
         def download_file(filename):
             """Download a file from the Chord network"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
                 # Secure the filename
                 filename = secure_filename(filename)
                 if not filename:
                     return jsonify({'error': 'Invalid filename'}), 400
                 
                 # Try to find file in node directory first
-                node_dir = f"{self.node_host}_{self.node_port}"
+                node_dir = self.node_dir
                 file_path = os.path.join(node_dir, filename)
                 if os.path.exists(file_path):
                     self.logger.info(f"File downloaded: {filename}")
@@ -257,12 +294,10 @@ class ChordRESTAPI:
                 return jsonify({'error': str(e)}), 500
         
         @self.app.route('/node/status', methods=['GET'])
+        @requires_node
         def get_node_status():
             """Get current node status"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
                 status = {
                     'node_id': f"{self.node_host}:{self.node_port}",
                     'key': self.chord_node.key,
@@ -282,12 +317,10 @@ class ChordRESTAPI:
                 return jsonify({'error': str(e)}), 500
         
         @self.app.route('/node/leave', methods=['POST'])
+        @requires_node
         def leave_network():
             """Make the node leave the network gracefully and shutdown the API server"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
                 # Perform graceful leave
                 self.chord_node.leave()
                 
@@ -320,19 +353,15 @@ class ChordRESTAPI:
         def get_bootstrap_status():
             """Get bootstrap server status"""
             try:
-                import socket
                 import json
                 
                 # Connect to bootstrap server
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                sock.connect((self.bootstrap_host, self.bootstrap_port))
+                sock = connect_to((self.bootstrap_host, self.bootstrap_port), timeout=5)
                 
-                # Request status (we'll need to modify bootstrap server to support this)
-                request = json.dumps({'action': 'status'}) + '\n'
-                sock.send(request.encode())
+                # Request status; the JSON reply is framed so it is not cut off at 1024 bytes
+                send_message(sock, "status")
                 
-                response = sock.recv(1024).decode().strip()
+                response = recv_message(sock)
                 sock.close()
                 
                 if response:
@@ -353,30 +382,42 @@ class ChordRESTAPI:
                 }), 503
         
         @self.app.route('/files/list', methods=['GET'])
+        @requires_node
         def list_files():
             """List all files known to this node"""
             try:
-                if not self.chord_node:
-                    return jsonify({'error': 'Chord node not initialized'}), 503
-                
-                files = []
+                # Optional pagination: only the requested page is materialized
+                offset = request.args.get('offset', 0, type=int)
+                limit = request.args.get('limit', type=int)
+                if offset < 0 or (limit is not None and limit < 0):
+                    return jsonify({'error': 'offset and limit must be non-negative'}), 400
+                
+                # Look up everything loop-invariant once, outside the loop
+                hasher = self.chord_node.hasher
+                node_dir = self.node_dir
+                end = offset + limit if limit is not None else None
+                
+                # Slicing copies the page in one atomic step, so node threads
+                # adding or removing files cannot shift entries mid-listing
+                total_files = len(self.chord_node.files)
+                page = self.chord_node.files[offset:end]
                 
                 # List files from the node's files list
-                for filename in self.chord_node.files:
-                    node_dir = f"{self.node_host}_{self.node_port}"
+                files = []
+                for filename in page:
                     file_path = os.path.join(node_dir, filename)
-                    
-                    file_info = {
+                    files.append({
                         'filename': filename,
                         'path': file_path,
                         'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
-                        'hash': self.chord_node.hasher(filename)
-                    }
-                    files.append(file_info)
+                        'hash': hasher(filename)
+                    })
                 
                 return jsonify({
                     'files': files,
                     'count': len(files),
+                    'total': total_files,
+                    'offset': offset,
                     'timestamp': datetime.now().isoformat()
                 })
                 
@@ -414,26 +455,30 @@ class ChordRESTAPI:
 
 def check_port_availability(port, host='localhost'):
     """Check if a port is available"""
+    # Binding is a local syscall, so it answers instantly instead of waiting
+    # on a connect timeout against a filtered port
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        result = sock.connect_ex((host, port))
-        sock.close()
-        return result != 0  # Port is available if connection failed
-    except:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
         return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
 
 def main():
     if len(sys.argv) < 2:
         print("Chord DHT REST API Server")
         print("=" * 30)
         print("Usage:")
-        print("  python3 rest_api.py <api_port> [node_port] [bootstrap_host] [bootstrap_port]")
+        print("  python3 rest_api.py <api_port> [node_port] [bootstrap_host] [bootstrap_port] [rpc_workers]")
         print()
         print("Examples:")
         print("  python3 rest_api.py 5001                    # API on 5001, node on 8000")
         print("  python3 rest_api.py 5001 8001               # API on 5001, node on 8001")
         print("  python3 rest_api.py 5001 8001 localhost 5000 # Full configuration")
+        print("  python3 rest_api.py 5001 8001 localhost 5000 8 # Use 8 RPC worker threads")
         print()
         print("⚠️  IMPORTANT: Do not use port 5000 for API - it's reserved for bootstrap server!")
         print()
@@ -452,6 +497,7 @@ def main():
     node_port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
     bootstrap_host = sys.argv[3] if len(sys.argv) > 3 else 'localhost'
     bootstrap_port = int(sys.argv[4]) if len(sys.argv) > 4 else 5000
+    rpc_workers = int(sys.argv[5]) if len(sys.argv) > 5 else None
     
     # Check for port conflicts
     if api_port == 5000:
@@ -476,7 +522,8 @@ def main():
         node_port=node_port,
         api_port=api_port,
         bootstrap_host=bootstrap_host,
-        bootstrap_port=bootstrap_port
+        bootstrap_port=bootstrap_port,
+        rpc_workers=rpc_workers
     )
     
     api.run()